@@ -4,6 +4,10 @@ from PIL import Image
 import time
 import math
 import numpy as np
+from tracker import RoiTracker
+from colours import ColourClassifier
+from roster import Roster, SHIFTS
+from capture import get_backend
 
 
 class Autofill:
@@ -21,49 +25,39 @@ class Autofill:
     colours : list[tuple[int]]
         List of pixel colours to filter. I.e the cell colours of the rota.
         E.g colours = [(146,208,80), (248,203,173), (68,114,196), (0,0,0)]
+        Used as the seed palette for templates without a saved palette.
+        If None, or if the rota isn't found with them, the colours are
+        learned from the screenshot and saved to palette_path.
+
+    n_colours : int
+        Number of cell colours to learn. If None, every dominant colour
+        of the screenshot is kept, see ColourClassifier.learn.
+
+    palette_path : str
+        Path of the json file of learned palettes, keyed by template.
+
+    capture_backend : object
+        Screen capture backend, see capture.get_backend.
+        Defaults to the fastest available backend.
     """
-    def __init__(self, screen_region, colours):
+    def __init__(self, screen_region, colours=None, palette_path='palettes.json',
+                 capture_backend=None, n_colours=None):
         self.screen_region = screen_region
-        self.screen_img = pa.screenshot(region=screen_region)
+        self.capture_backend = capture_backend or get_backend()
+        self.screen_img = self.capture_backend.grab(screen_region)
         self.colours = colours
+        self.palette_path = palette_path
+        self.n_colours = n_colours
+        self.template = 'default'
+        self.classifier = ColourClassifier(colours) if colours else None
         self.y0 = None
         self.x0 = None
         self.cell_width = None
         self.cell_height = None
         self.horizontal_cell_centres = None
         self.shifts = None
-
-    def check_same_colour(self, colour_one, colour_two, threshold=35):
-        """
-        Checks if two colours are the same, but perhaps
-        different shades by taking the norm of the differences
-        between their rgb vectors and comparing to threshold.
-
-        Parameters
-        ----------
-        colour_one : tuple[int]
-            (R, G, B) tuple of the first colour.
-
-        colour_two : tuple[int]
-            (R, G, B) tuple of the second colour.
-
-        threshold : int
-            The maximum distance that two colours can be 
-            to be considered the same shade.
-            A good value is around 35.
-        
-        Returns
-        -------
-        is_same_colour : bool
-            True if same colour and False if not.
-        """
-        colour_one = np.array(colour_one) 
-        colour_two = np.array(colour_two) 
-        if np.linalg.norm(colour_one - colour_two) < threshold:
-            return True
-        else:
-            return False
-
+        self.tracker = None
+        self.signatures = {} # name -> (ink profile, clipped) of a confirmed write
 
     def get_pixel_line(self, start, end, orientation, img=None):
         """
@@ -82,8 +76,8 @@ class Autofill:
             Orientation of the line.
             Either 'vertical' or 'horizontal'.
 
-        img : PIL.PngImagePlugin.PngImageFile
-            Image to get the pixels from.
+        img : np.ndarray
+            (height, width, 3) RGB array to get the pixels from.
 
         Returns
         -------
@@ -94,23 +88,22 @@ class Autofill:
         """
         # If no img argument is given, we use the whole screen
         # screenshot attribute
-        if not img: img = self.screen_img
+        if img is None: img = self.screen_img
+        img = np.asarray(img)
 
         x0, y0 = start
-        pix_line = []
         if orientation == 'vertical':
-            for y in range(start[1], end[1]+1):
-                pix_col = img.getpixel((x0, y))
-                pix_line.append((pix_col, y))
+            coords = range(start[1], end[1]+1)
+            pix_cols = img[start[1]:end[1]+1, x0, :3].tolist()
         elif orientation == 'horizontal':
-            for x in range(start[0], end[0]+1):
-                pix_col = img.getpixel((x, y0))
-                pix_line.append((pix_col, x))
+            coords = range(start[0], end[0]+1)
+            pix_cols = img[y0, start[0]:end[0]+1, :3].tolist()
         else:
             raise Exception(f"Orientation: {orientation} "\
             "is not a valid orientation! Use either vertical"\
             "or horizontal.")
 
+        pix_line = [(tuple(pix_col), coord) for pix_col, coord in zip(pix_cols, coords)]
         return pix_line
 
     def filter_pixel_line(self, pix_line):
@@ -129,24 +122,22 @@ class Autofill:
             List of tuples of pixel colour and coordinate, grouped
             by cell colour.
         """
+        if not pix_line: return []
+        # Classify the whole line in one go and filter out unwanted colours
+        classes = self.classifier.classify([pix[0] for pix in pix_line])
         filtered_pix_line = []
-        # Filter out unwanted colours
-        for pix in pix_line:
-            pix_col, pix_coord = pix
-            if pix_col == (0,0,0):
+        filtered_classes = []
+        for pix, pix_class in zip(pix_line, classes):
+            if pix_class != ColourClassifier.UNKNOWN:
                 filtered_pix_line.append(pix)
-            else:
-                for col in self.colours:
-                    # Note the second condition is so that we don't get any grays.
-                    if self.check_same_colour(pix_col, col) and sum(pix_col) > 100:
-                        filtered_pix_line.append(pix)
+                filtered_classes.append(pix_class)
         # If no cells detected, we return empty list
         if not filtered_pix_line: return []
 
         # Get all the indices of the black pixels, i.e the cell borders
         black_idx = []
-        for i in range(len(filtered_pix_line)):
-            if filtered_pix_line[i][0] == (0,0,0):
+        for i in range(len(filtered_classes)):
+            if filtered_classes[i] == ColourClassifier.BORDER:
                 black_idx.append(i)
 
         # If no blacks detected, return empty list
@@ -154,18 +145,18 @@ class Autofill:
 
         cells = []
         # First we check if we're starting in a cell
-        if black_idx[0] != 0: cells.append(filtered_pix_line[0:black_idx[0]]) 
+        if black_idx[0] != 0: cells.append(range(0, black_idx[0]))
         for i in range(len(black_idx) - 1):
-            cell = filtered_pix_line[black_idx[i]:black_idx[i+1]]
+            cell = range(black_idx[i], black_idx[i+1])
             cells.append(cell)
 
         # Get rid of any excess black cells
         filtered_cells = []
         for cell in cells:
             filtered_cell = []
-            for pix in cell:
-                if pix[0] != (0,0,0): # Not black
-                    filtered_cell.append(pix)
+            for i in cell:
+                if filtered_classes[i] != ColourClassifier.BORDER: # Not black
+                    filtered_cell.append(filtered_pix_line[i])
             # Don't add if empty
             if filtered_cell: filtered_cells.append(filtered_cell)
 
@@ -214,7 +205,7 @@ class Autofill:
         """
         border_idx = []
         for i in range(len(cell_centres)-1): 
-            if not self.check_same_colour(cell_centres[i][0], cell_centres[i+1][0], 30):
+            if not self.classifier.same_class(cell_centres[i][0], cell_centres[i+1][0]):
                 border_idx.append(i)
 
         cells_by_shift = [cell_centres[:border_idx[0]+1]] # edge case
@@ -300,10 +291,17 @@ class Autofill:
         screen_top = self.screen_region[1]
         screen_left = self.screen_region[0]
         filtered_horizontal_cells = []
+        self.signatures = {} # Text renders differently after a zoom
         pa.click((1000,800)) # Move mouse focus
         print("Taking screenshot...")
         time.sleep(1)
-        self.screen_img = pa.screenshot(region=self.screen_region) # Retake screenshot
+        self.screen_img = self.capture_backend.grab(self.screen_region) # Retake screenshot
+        if self.classifier is None:
+            print("Learning cell colours...")
+            # Skip the title bars, so we only see the rota
+            self.classifier = ColourClassifier.learn(
+                    self.screen_img[screen_top+200:screen_height, 0:screen_width],
+                    n_colours=self.n_colours)
         # Move down the screen until we detect the correct self.colours
         # Should always find in the top half, so we only go to third height
         for y in range(screen_top+200, int(screen_height/3), 10): # - constants to get negate title bars
@@ -328,6 +326,8 @@ class Autofill:
             print(f"Updated x0: {self.x0}")
 
         else:
+            # Colours may have changed, so relearn from the next screenshot
+            self.classifier = None
             pa.moveTo((500,500)) # Re-focus the mouse
             pa.hscroll(-50) # Horizontal scroll left
             time.sleep(0.5)
@@ -345,6 +345,16 @@ class Autofill:
             # Difference between cell centre y coords for first two cells in first shift
             self.cell_height = shifts[-1][1][1] - shifts[-1][0][1]
             print("Updating cell height:", self.cell_height)
+            if self.classifier.learned:
+                print(f"Saving palette for {self.template}...")
+                self.classifier.save(self.palette_path, self.template)
+
+        elif not self.classifier.learned:
+            # The seed or saved palette may be out of date, e.g a shift
+            # colour was added, so try learning it before zooming out
+            print("Wrong number of shifts, relearning cell colours...")
+            self.classifier = None
+            self.calibrate_start_and_get_shifts()
 
         else:
             print("Zooming out...")
@@ -353,6 +363,47 @@ class Autofill:
             self.calibrate_start_and_get_shifts()
 
 
+    def shift_coords(self, dx, dy):
+        """
+        Shift all of the cached calibration coordinates by (dx, dy),
+        e.g after the rota has been scrolled.
+
+        Parameters
+        ----------
+        dx : int
+            Horizontal offset in pixels.
+
+        dy : int
+            Vertical offset in pixels.
+
+        Returns
+        -------
+        None
+        """
+        self.x0 += dx
+        self.y0 += dy
+        self.horizontal_cell_centres = [(col, x + dx) for col, x in self.horizontal_cell_centres]
+        self.shifts = [[(col, y + dy) for col, y in shift] for shift in self.shifts]
+
+    def track_drift(self):
+        """
+        Check the calibrated table hasn't moved before we write to it.
+        Small scrolls are followed by shifting the cached coordinates,
+        anything else (e.g a zoom) triggers a full recalibration.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+        """
+        if self.tracker is None or self.tracker.check_drift() is None:
+            if self.tracker is not None: print("Lost track of the rota, recalibrating...")
+            self.calibrate_start_and_get_shifts()
+            self.tracker = RoiTracker(self)
+
     def move_and_write(self, coords, text):
         """
         Wrapper function which combines pyautogui doubleClick
@@ -372,6 +423,173 @@ class Autofill:
         pa.write(text)
         pa.hotkey('esc')
 
+    def get_cell_region(self, cell_centre):
+        """
+        Get the screen region of the cell centred at cell_centre.
+
+        Parameters
+        ----------
+        cell_centre : tuple[int]
+            Centre (x,y) coordinate of the cell.
+
+        Returns
+        -------
+        cell_region : tuple[int]
+            (left, top, width, height) of the cell.
+        """
+        cell_left = cell_centre[0] - int(self.cell_width/2)
+        cell_top = cell_centre[1] - int(self.cell_height/2)
+        return (cell_left, cell_top, self.cell_width, self.cell_height)
+
+    def capture_cell(self, cell_centre):
+        """
+        Screenshot only the cell centred at cell_centre.
+        A lot faster than screenshotting the whole screen.
+
+        Parameters
+        ----------
+        cell_centre : tuple[int]
+            Centre (x,y) coordinate of the cell.
+
+        Returns
+        -------
+        cell_img : np.ndarray
+            (cell_height, cell_width, 3) RGB array of the cell.
+        """
+        return self.capture_backend.grab(self.get_cell_region(cell_centre))
+
+    def cell_interior(self, cell_img, inset=1):
+        """
+        Get the interior of a cell image, without the inset pixels
+        around its edge.
+
+        Parameters
+        ----------
+        cell_img : np.ndarray
+            (height, width, 3) RGB array of the cell.
+
+        inset : int
+            Number of pixels to ignore around the edge of the cell,
+            e.g to ignore the selection border of the active cell.
+
+        Returns
+        -------
+        interior : np.ndarray
+            View of the interior of cell_img.
+        """
+        return np.asarray(cell_img)[inset:self.cell_height-inset, inset:self.cell_width-inset]
+
+    def cell_has_text(self, cell_img, inset=1):
+        """
+        Check if a cell image contains text, i.e if any two horizontally
+        adjacent pixels inside the cell differ. In an empty cell we expect
+        all the same colour.
+
+        Parameters
+        ----------
+        cell_img : np.ndarray
+            (height, width, 3) RGB array of the cell.
+
+        inset : int
+            Number of pixels to ignore around the edge of the cell,
+            see cell_interior.
+
+        Returns
+        -------
+        has_text : bool
+            True if the cell contains text, False if not.
+        """
+        interior = self.cell_interior(cell_img, inset)
+        return bool(np.any(interior[:, 1:] != interior[:, :-1]))
+
+    def text_signature(self, cell_img, inset=3, min_contrast=60):
+        """
+        Get the ink column profile of the text in a cell, i.e the number
+        of pixels in each column which differ from the cell background,
+        trimmed to the columns with text. The same name renders the same
+        in every cell, so this tells our name apart from a colleague's.
+
+        Parameters
+        ----------
+        cell_img : np.ndarray
+            (height, width, 3) RGB array of the cell.
+
+        inset : int
+            Number of pixels to ignore around the edge of the cell,
+            see cell_interior.
+
+        min_contrast : int
+            Minimum summed RGB difference from the background for a
+            pixel to count as ink.
+
+        Returns
+        -------
+        profile : np.ndarray
+            Number of ink pixels in each column of the text.
+
+        clipped : bool
+            True if the text runs into the edge of the cell, so may be
+            cut off.
+        """
+        interior = self.cell_interior(cell_img, inset).astype(np.int16)
+        # Text only covers a small part of the cell, so the median is the background
+        background = np.median(interior.reshape(-1, 3), axis=0)
+        ink_mask = np.abs(interior - background).sum(axis=-1) > min_contrast
+        # Ignore any cell borders caught in the interior, text never fills a row
+        ink_mask = ink_mask[ink_mask.mean(axis=1) < 0.9]
+        columns = ink_mask.sum(axis=0)
+        ink = np.flatnonzero(columns)
+        if not len(ink): return columns[:0], False
+        clipped = ink[0] == 0 or ink[-1] == len(columns) - 1
+        return columns[ink[0]:ink[-1]+1], bool(clipped)
+
+    def matches_name(self, name, cell_img, max_diff=0.25, max_width_error=0.5):
+        """
+        Check if the text in a written cell looks like name, i.e that we
+        won the cell rather than a colleague writing at the same moment.
+        The text is compared with an earlier confirmed write of the same
+        name or, if there isn't one, its width with the average text width
+        per character of the other confirmed names.
+
+        Parameters
+        ----------
+        name : str
+            Name we wrote.
+
+        cell_img : np.ndarray
+            (height, width, 3) RGB array of the cell after writing.
+
+        max_diff : float
+            Maximum difference between the ink profiles of the same name,
+            as a fraction of its total ink, e.g if a cell cuts off part
+            of a row of text.
+
+        max_width_error : float
+            Maximum difference between the text width and the width
+            expected for the length of name, as a fraction of the expected
+            width. Loose, as character widths vary.
+
+        Returns
+        -------
+        matches : bool or None
+            True or False, or None if there is nothing to compare with yet,
+            e.g the first write, or clipped text with no earlier write of name.
+        """
+        profile, clipped = self.text_signature(cell_img)
+        if name in self.signatures:
+            ref, ref_clipped = self.signatures[name]
+            if len(profile) != len(ref):
+                # Anti-aliasing on different cell colours may add a column
+                if clipped or ref_clipped or abs(len(profile) - len(ref)) > 2: return False
+            n = min(len(profile), len(ref))
+            return bool(np.abs(profile[:n] - ref[:n]).sum() <= max_diff * max(ref.sum(), 1))
+
+        widths = [len(ref) / len(other) for other, (ref, ref_clipped) in self.signatures.items()
+                  if not ref_clipped]
+        if clipped or not widths: return None
+        expected = np.median(widths) * len(name)
+        return bool(abs(len(profile) - expected) <= max_width_error * expected)
+
     def check_occupied(self, cell_centre):
         """
         Check if a cell is already occupied.
@@ -386,53 +604,253 @@ class Autofill:
         is_occupied : bool
             True if cell is already occupied, False if not.
         """
-        # Get the cell region.
-        cell_left = cell_centre[0] - int(self.cell_width/2)
-        cell_top = cell_centre[1] - int(self.cell_height/2)
-        cell_region = (cell_left, cell_top, self.cell_width, self.cell_height)
-        # Screenshot only the cell_region.
-        # A lot faster than screenshotting the whole screen.
-        cell_img = pa.screenshot(region=cell_region)
-        for y in range(1, self.cell_height-1):
-            left = (1, y)
-            right = (self.cell_width-1, y)
-            pix_line = self.get_pixel_line(start=left, end=right, img=cell_img, orientation='horizontal')
-            for i in range(len(pix_line)-1):
-                # If we detect different colours, i.e someones name
-                # In an empty cell we expect all the same colour
-                if pix_line[i][0] != pix_line[i+1][0]:
-                    return True
-
-        return False
-
-    def autofill_shifts(self, rota_url, shift_list):
+        return self.cell_has_text(self.capture_cell(cell_centre))
+
+    def claim_cell(self, name, shift, shift_num, start=0, on_write=None):
+        """
+        Write name in the first free cell of a shift.
+
+        Parameters
+        ----------
+        name : str
+            Name to write.
+
+        shift : str
+            Shift name, e.g 'sunday morning'.
+
+        shift_num : int
+            Index of the shift in self.shifts.
+
+        start : int
+            Index of the first cell in the shift to try.
+
+        on_write : callable
+            Called with (name, shift) just before the name is written.
+
+        Returns
+        -------
+        write : dict or None
+            Record of the write, containing name, shift, shift_num,
+            the cell index and the pre-write cell image (pre_img),
+            or None if all cells from start onwards are occupied.
+        """
+        shift_cells = self.shifts[shift_num]
+        for i in range(start, len(shift_cells)):
+            y = shift_cells[i][1] # ith person gets the ith cell
+            cell_img = self.capture_cell((self.x0, y))
+            if not self.cell_has_text(cell_img):
+                # Copy, as the capture backend may reuse its buffer
+                pre_img = cell_img.copy()
+                print(f"Filling in {shift} for {name} at {(self.x0, y)}...")
+                if on_write: on_write(name, shift)
+                self.move_and_write(coords=(self.x0, y), text=name)
+                return {'name': name, 'shift': shift, 'shift_num': shift_num,
+                        'cell': i, 'pre_img': pre_img}
+
+        print(f"All cells for {shift} occupied!")
+        return None
+
+    def verify_writes(self, writes, inset=3, settle_time=0.3):
+        """
+        Recapture all of the written cells in one region of interest
+        capture and compare with their pre-write state to check that
+        text appeared, and that it is our name, see matches_name.
+
+        Parameters
+        ----------
+        writes : list[dict]
+            Write records returned by claim_cell.
+
+        inset : int
+            Number of pixels to ignore around the edge of each cell, so
+            that the selection border of the active cell is not
+            mistaken for text.
+
+        settle_time : float
+            Seconds to wait for the last write to be rendered.
+
+        Returns
+        -------
+        confirmed : list[dict]
+            Writes where our name appeared. Writes which could only be
+            checked for text, e.g the first write, have 'unchecked' set.
+
+        lost : list[dict]
+            Writes where the cell is unchanged or still empty,
+            e.g a missed double-click.
+
+        contested : list[dict]
+            Writes where text appeared but it isn't our name,
+            e.g a colleague's edit won the cell.
+        """
+        if not writes: return [], [], []
+        time.sleep(settle_time)
+        self.track_drift() # Written cells must be where we think they are
+        frame = self.tracker.capture()
+        confirmed, lost, contested = [], [], []
+        for write in writes:
+            y = self.shifts[write['shift_num']][write['cell']][1]
+            post_img = self.tracker.crop(frame, self.get_cell_region((self.x0, y)))
+            pre_img = write['pre_img']
+            changed = post_img.shape != pre_img.shape or np.any(
+                self.cell_interior(post_img, inset) != self.cell_interior(pre_img, inset))
+            if not (changed and self.cell_has_text(post_img, inset=inset)):
+                lost.append(write)
+                continue
+            matches = self.matches_name(write['name'], post_img)
+            if matches is False:
+                contested.append(write)
+                continue
+            write['unchecked'] = matches is None
+            if write['name'] not in self.signatures:
+                self.signatures[write['name']] = self.text_signature(post_img)
+            confirmed.append(write)
+
+        return confirmed, lost, contested
+
+    def get_occupancy(self):
+        """
+        Get the occupancy map of every cell in every shift
+        from a single region of interest capture.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        occupancy : list[list[bool]]
+            For each shift, whether each of its cells is occupied.
+        """
+        frame = self.tracker.capture()
+        return [[self.cell_has_text(self.tracker.crop(frame, self.get_cell_region((self.x0, cell[1]))))
+                 for cell in shift] for shift in self.shifts]
+
+    def confirm_writes(self, writes, report, max_reclaims=3, on_confirm=None):
+        """
+        Verify writes, re-claiming any that were lost, or won by someone
+        else, in the same shift until every write is either confirmed or
+        has failed.
+
+        Parameters
+        ----------
+        writes : list[dict]
+            Write records returned by claim_cell.
+
+        report : dict
+            Report to update, see autofill_shifts.
+
+        max_reclaims : int
+            Maximum number of times a single lost shift is re-claimed.
+
+        on_confirm : callable
+            Called with (name, shift) as soon as each write is confirmed.
+
+        Returns
+        -------
+        None
+        """
+        for write in writes: write.setdefault('attempts', 0)
+        while writes:
+            report['attempted'] += len(writes)
+            confirmed, lost, contested = self.verify_writes(writes)
+            for write in confirmed:
+                report['filled'].append([write['name'], write['shift']])
+                if write['unchecked']: report['unchecked'].append([write['name'], write['shift']])
+                if on_confirm: on_confirm(write['name'], write['shift'])
+                if 'lost_at' in write:
+                    secs = time.perf_counter() - write['lost_at']
+                    print(f"Re-claimed {write['shift']} for {write['name']} in {secs:.2f} secs")
+                    report['reclaims'].append([write['name'], write['shift'], secs])
+
+            for write in contested:
+                print(f"{write['shift']} cell {write['cell']} for {write['name']} "
+                      "was taken by someone else's edit.")
+                report['contested'].append([write['name'], write['shift']])
+
+            writes = []
+            for write in lost + contested:
+                lost_at = write.get('lost_at', time.perf_counter())
+                if write['attempts'] >= max_reclaims:
+                    print(f"Lost {write['shift']} for {write['name']}, out of re-claims.")
+                    print("Failed to autofill shift.")
+                    report['failed'].append([write['name'], write['shift']])
+                    continue
+                print(f"Lost {write['shift']} for {write['name']}, re-claiming...")
+                self.track_drift()
+                # A lost cell may still be free, e.g after a missed double-click,
+                # a contested one is now occupied so is skipped
+                reclaim = self.claim_cell(write['name'], write['shift'], write['shift_num'], start=write['cell'])
+                if reclaim:
+                    reclaim['attempts'] = write['attempts'] + 1
+                    reclaim['lost_at'] = lost_at
+                    writes.append(reclaim)
+                else:
+                    print("Failed to autofill shift.")
+                    report['failed'].append([write['name'], write['shift']])
+
+    def autofill_shifts(self, rota_url, shift_list, template='default',
+                        max_reclaims=3, verify_every=5, on_confirm=None, on_write=None):
         """
         Worker function that combines the other methods
         to autofill shift_list.
+        The roster is allocated to cells in one pass against the occupancy
+        map, then the planned cells are written and verified in batches,
+        re-claiming any lost cells in the same shift.
 
         Parameters
         ----------
         rota_url : str
             The url of the excel file to open in the browser.
 
-        shift_list : list[list[str, list[str]]]
-            Nested list of names and shifts e.g 
+        shift_list : roster.Roster or list
+            Compiled roster, or a nested list of names and shifts e.g 
             [['Isaac Lee', ['wednesday evening', 'saturday evening', 'sunday morning']]
              ['Nithil Kennedy', ['thursday afternoon']]]
+            which is validated with Roster.load before anything is opened.
+
+        template : str
+            Name of the rota template, used to look up the saved palette.
+
+        max_reclaims : int
+            Maximum number of times a single lost shift is re-claimed.
+
+        verify_every : int
+            Number of writes between verifications.
+
+        on_confirm : callable
+            Called with (name, shift) as soon as each write is confirmed,
+            e.g to record progress so an interrupted fill can be resumed.
+
+        on_write : callable
+            Called with (name, shift) just before each planned write, so
+            an interrupted fill knows which shifts may have been written
+            without being confirmed. Re-claims of a lost write are not
+            reported again.
 
         Returns
         -------
-        None
+        report : dict
+            Dictionary with the confirmed shifts ('filled'), those of them
+            only checked for text, not for our name ('unchecked'), the
+            writes won by someone else's edit ('contested'), the failed
+            shifts ('failed'), all as lists of [name, shift], the re-claims
+            ('reclaims') as a list of [name, shift, secs taken] and the
+            number of writes attempted ('attempted'). The win rate is
+            filled / attempted.
         """
-        shift_to_int_map = {
-            'monday morning': 0, 'monday afternoon': 1, 'monday evening': 2,
-            'tuesday morning': 3, 'tuesday afternoon': 4, 'tuesday evening': 5,
-            'wednesday morning': 6, 'wednesday afternoon': 7, 'wednesday evening': 8,
-            'thursday morning': 9, 'thursday afternoon': 10, 'thursday evening': 11,
-            'friday morning': 12, 'friday afternoon': 13, 'friday evening': 14,
-            'saturday morning': 15, 'saturday afternoon': 16, 'saturday evening': 17,
-            'sunday morning': 18, 'sunday afternoon': 19, 'sunday evening': 20,
-                            }
+        if isinstance(shift_list, Roster):
+            roster = shift_list
+        else:
+            roster = Roster.load(shift_list)
+        self.template = template
+        saved_classifier = ColourClassifier.load(self.palette_path, template)
+        if saved_classifier:
+            self.classifier = saved_classifier
+        elif self.colours:
+            self.classifier = ColourClassifier(self.colours)
+        else:
+            self.classifier = None # Learn from the first screenshot
         print("Opening rota...")
         webbrowser.open(url=rota_url, new=0, autoraise=True)
         # print("Sleeping 1 sec...")
@@ -440,41 +858,42 @@ class Autofill:
         # print("Finished sleeping!")
         print("Calibrating...")
         self.calibrate_start_and_get_shifts()
-        displacement = 0
-        failed_shifts = []
-        for person in shift_list:
-            name = person[0]
-            shift_sublist = person[1]
-            for shift in shift_sublist:
-                # print("")
-                # print(name)
-                # print(shift)
-                # print("-" * 40)
-                shift_num = shift_to_int_map[shift]
-                shift_cells = self.shifts[shift_num]
-                # print(f"Number of cells in shift: {len(shift_cells)}")
-
-                for i in range(len(shift_cells)):
-                    # print(f"Trying cell: {i}")
-                    cell = shift_cells[i] # ith person gets the ith cell
-                    y = cell[1]
-                    if not self.check_occupied((self.x0, y)):
-                        print(f"Filling in {shift} for {name} at {(self.x0, y)}...")
-                        self.move_and_write(coords=(self.x0, y), text=name)
-                        break # move onto next shift
-                    else: # Occupied
-                        # print(f"Cell {i} for {shift} already occupied!")
-                        if i == len(shift_cells)-1: # Last cell occupied
-                            print(f"All cells for {shift} occupied!")
-                            print("Failed to autofill shift.")
-                            failed_shifts.append([name, shift])
-
-            displacement += 1
+        self.tracker = RoiTracker(self)
+        report = {'filled': [], 'unchecked': [], 'contested': [], 'failed': [],
+                  'reclaims': [], 'attempted': 0}
+
+        plan, failed_items = roster.allocate(self.get_occupancy())
+        for item in failed_items:
+            print(f"All cells for {SHIFTS[item.shift_num]} occupied!")
+            report['failed'].append([item.name, SHIFTS[item.shift_num]])
+
+        writes = []
+        for item, cell in plan:
+            shift = SHIFTS[item.shift_num]
+            self.track_drift() # Make sure the cached coords are still valid
+            # Starting from the planned cell, in case it was taken since
+            write = self.claim_cell(item.name, shift, item.shift_num, start=cell,
+                                    on_write=on_write)
+            if write:
+                writes.append(write)
+            else:
+                print("Failed to autofill shift.")
+                report['failed'].append([item.name, shift])
+            if len(writes) >= verify_every:
+                self.confirm_writes(writes, report, max_reclaims, on_confirm)
+                writes = []
+        self.confirm_writes(writes, report, max_reclaims, on_confirm)
 
         print("Finished autofilling.")
-        print(f"No. shifts failed: {len(failed_shifts)}")
+        print(f"Writes confirmed: {len(report['filled'])}/{report['attempted']}"
+              f" ({len(report['unchecked'])} only checked for text)")
+        print(f"Writes won by someone else: {len(report['contested'])}")
+        print(f"No. re-claims: {len(report['reclaims'])}")
+        for reclaim in report['reclaims']: print(f"{reclaim[0]}, {reclaim[1]}: {reclaim[2]:.2f} secs")
+        print(f"No. shifts failed: {len(report['failed'])}")
         print("Failed shifts:")
-        for failed_shift in failed_shifts: print(failed_shift)
+        for failed_shift in report['failed']: print(failed_shift)
+        return report
 
 
 if __name__ == '__main__':
@@ -0,0 +1,50 @@
+"""
+Per-frame capture latency benchmark for each capture backend.
+
+Grabs the full screen, a single cell sized region, and cell sized regions
+of more sizes than the x11 backend keeps buffers for, so that every grab
+evicts a buffer and allocates a new one. Run under a real display or Xvfb,
+e.g: xvfb-run -s "-screen 0 1080x1920x24" python bench_capture.py [frames]
+"""
+import sys
+import time
+import numpy as np
+from capture import get_backend
+
+CELL_REGION = (500, 500, 120, 20)
+# One more size than X11ShmCapture keeps buffers for by default
+EVICT_REGIONS = [(500, 500, 120 + i, 20) for i in range(5)]
+
+
+def bench(backend, regions, frames):
+    """Returns (mean, best) milliseconds per grab, cycling through regions."""
+    backend.grab(regions[0])  # Warm up, e.g allocate the buffer
+    times = []
+    for i in range(frames):
+        start = time.perf_counter()
+        backend.grab(regions[i % len(regions)])
+        times.append((time.perf_counter() - start) * 1000)
+    return np.mean(times), np.min(times)
+
+
+if __name__ == '__main__':
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    screen = np.zeros((1920, 1080, 3), dtype=np.uint8)
+    backends = [('x11', {}), ('pyautogui', {}), ('file', {'screen': screen})]
+    print(f"{'backend':<12}{'region':<12}{'mean (ms)':>12}{'best (ms)':>12}")
+    for name, kwargs in backends:
+        try:
+            backend = get_backend(name, **kwargs)
+        except Exception as e:
+            print(f"{name:<12}unavailable, {type(e).__name__}: {e}")
+            continue
+        # The whole screen, whatever its size, e.g xvfb-run defaults to 1280x1024
+        screen_region = (0, 0, *backend.screen_size)
+        for region_name, regions in (('screen', [screen_region]), ('cell', [CELL_REGION]),
+                                     ('cell evict', EVICT_REGIONS)):
+            try:
+                mean, best = bench(backend, regions, frames)
+                print(f"{name:<12}{region_name:<12}{mean:>12.3f}{best:>12.3f}")
+            except Exception as e:
+                print(f"{name:<12}{region_name:<12}failed, {type(e).__name__}: {e}")
+        backend.close()
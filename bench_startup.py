@@ -0,0 +1,43 @@
+"""
+Import-time and memory benchmark for the watcher and the filler.
+
+Each module is imported in a fresh interpreter, so the numbers are what a
+(re)start costs. Run with: python bench_startup.py [repeats]
+"""
+import subprocess
+import sys
+import time
+
+MODULES = ['bot', 'scanner', 'filler', 'autofiller']
+# Print the peak resident memory of the interpreter after the import, in KB on Linux
+SNIPPET = "import {module}; import resource; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+def bench(module, repeats=5):
+    """
+    Import module in a fresh interpreter repeats times.
+    Returns (best wall time in ms, peak rss in MB) or None if the import failed.
+    """
+    times = []
+    rss = 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, '-c', SNIPPET.format(module=module)],
+                              capture_output=True, text=True)
+        times.append((time.perf_counter() - start) * 1000)
+        if proc.returncode != 0:
+            print(f"{module}: import failed, {proc.stderr.strip().splitlines()[-1]}")
+            return None
+        rss = max(rss, int(proc.stdout.split()[-1]) / 1024)
+    return min(times), rss
+
+
+if __name__ == '__main__':
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    baseline = bench('sys', repeats)
+    print(f"{'module':<12}{'start up (ms)':>16}{'peak rss (MB)':>16}")
+    print(f"{'(python)':<12}{baseline[0]:>16.1f}{baseline[1]:>16.1f}")
+    for module in MODULES:
+        result = bench(module, repeats)
+        if result:
+            print(f"{module:<12}{result[0]:>16.1f}{result[1]:>16.1f}")
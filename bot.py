@@ -1,16 +1,88 @@
+# Only import what the watcher needs to poll and detect.
+# pyautogui, PIL, NumPy and vlc are only loaded by the filler worker.
 import scanner
-import autofiller
+import filler
+from roster import Roster
+from jobs import JobQueue
+from status import Status, EventLog
 import time
-import vlc
-import os
 import json
-import pyautogui as pa
-from datetime import datetime as dt
+import signal
+
+
+def dispatch(fl, jobs, roster, status):
+    """Hand the highest priority queued rota to the filler, if it is free."""
+    if jobs.in_flight: return
+    job = jobs.next()
+    if job:
+        status.event('fill', f"Filling {job['rota_name']}, {len(jobs.pending())} more queued")
+        if job['written']:
+            status.event('resume', f"{job['rota_name']}: skipping {len(job['written'])} "
+                         f"unconfirmed writes {job['written']}")
+        # Skip any shifts written before a crash
+        fl.submit(job['rota_name'], job['rota_url'], roster.without(jobs.skipped(job['rota_name'])))
+
+
+def handle_message(message, jobs, old_rotas, status):
+    """
+    Handle one (kind, rota_name, payload) message from the filler worker.
+    Returns True if it finished filling a rota.
+    """
+    kind, rota_name, payload = message
+    if kind == 'written':
+        jobs.written(rota_name, payload)
+        return False
+    if kind == 'progress':
+        jobs.progress(rota_name, payload)
+        return False
+    job = jobs.finish(rota_name, payload)
+    if job['state'] != jobs.DONE:  # Re-queued or given up on, but the watcher carries on
+        status.event('fill_error', f"{rota_name} ({job['state']}): {job['error']}")
+        return False
+    with open('old_rotas.txt', 'a') as f:
+        # Append old rotas with new rota
+        f.write(rota_name + '\n')
+    status.event('done', f"{rota_name}: {len(payload['filled'])}/{payload['attempted']} writes won, "
+                 f"{len(payload['contested'])} lost to others, {len(payload['failed'])} failed")
+    old_rotas.append(rota_name)
+    return True
+
+
+def handle_messages(fl, jobs, old_rotas, status):
+    """
+    Handle the filler worker's messages one at a time, so that an
+    interrupt (e.g ctrl-c to toggle AFK) or an error part way through
+    leaves the rest queued. Returns the number of rotas finished.
+    """
+    num_finished = 0
+    while True:
+        message = fl.next_message()
+        if message is None: return num_finished
+        try:
+            num_finished += handle_message(message, jobs, old_rotas, status)
+        except KeyboardInterrupt:
+            fl.leftover.insert(0, message)  # Not handled yet, retry next loop
+            raise
 
 
 def main(shift_list, drive='personal', relative_path='February 2022',
-         play_music=True, afk_mode=True, sleep_time=2):
-    """Instantiate both autofiller and scanner objects and combine in a loop."""
+         play_music=True, afk_mode=True, sleep_time=2,
+         token_cache_path='token_cache.json', jobs_path='jobs.json',
+         log_path='events.jsonl', status_interval=10, fill_timeout=1800):
+    """
+    Watch the drive for new rotas and queue them, newest week first, for
+    a pre-forked filler worker. The watcher keeps polling while a rota is
+    being filled, so it stays light, restarts quickly and picks up new
+    rotas straight away. Status is shown on a dashboard refreshed at most
+    every status_interval secs (longer than sleep_time, so that polls
+    don't all redraw), and events are logged to log_path. While a rota
+    is being filled the dashboard scrolls instead of redrawing in place,
+    so the filler's output stays visible. A fill taking longer than
+    fill_timeout secs, e.g a hung worker, is failed and the worker restarted.
+    """
+    # Validate the roster up front, rather than halfway through a fill
+    roster = Roster.load(shift_list)
+    print(f"Roster loaded: {len(roster.people)} people, {len(roster.work_items)} shifts")
     with open('credentials.json', 'r') as f:  # Read in our credentials json
         credentials = json.load(f)
     scope = ['User.Read', 'Files.ReadWrite.All', 'Files.Read.All',
@@ -41,136 +113,109 @@ def main(shift_list, drive='personal', relative_path='February 2022',
         account_type=account_type,
         root_driveid=root_driveid)
 
-    gc.get_access_token()  # Web app client authentication
+    # Reuse the cached refresh token so a restart doesn't need a fresh login
+    try:
+        if not gc.load_tokens(token_cache_path):
+            raise KeyError('refresh_token')
+        gc.refresh_access_token()
+    except KeyError:  # No cached token, or it has expired
+        gc.get_access_token()  # Web app client authentication
+    gc.save_tokens(token_cache_path)
 
     with open('old_rotas.txt', 'r') as f:  # Read in old rota names as a list
         old_rotas = f.read().splitlines()
+    # Resumes any jobs left unfinished by a crash
+    jobs = JobQueue(jobs_path)
 
     screen_region = (0, 0, 1080, 1920)  # Docked
     # screen_region = (0,0,2560,1600) # Laptop, not really working
+    # Seed cell colours, relearned per template if they don't match the rota
     colours = [(146, 208, 80), (248, 203, 173),
-               (68, 114, 196), (0, 0, 0)]  # Cell colours
-    # Instantiate an Autofill object
-    af = autofiller.Autofill(screen_region=screen_region, colours=colours)
+               (68, 114, 196), (0, 0, 0)]
+    # Pre-fork the filler worker, which loads the GUI dependencies
+    fl = filler.Filler(screen_region=screen_region, colours=colours,
+                       play_music=play_music, afk_mode=afk_mode,
+                       idle_time=sleep_time)
 
     counter = 0
     num_rotas_autofilled = 0
-    start_time = dt.now()  # Keep track of time elapsed
     finished = False
-    error_log = []
+    status = Status(min_interval=status_interval, log=EventLog(log_path))
+    status.event('start', f"Scanning {drive} drive, {relative_path}")
+
+    def on_sigterm(signum, frame):
+        # E.g systemd restarting us, so don't leave the worker filling
+        status.event('stop', "SIGTERM received, stopping filler worker")
+        fl.stop()
+        handle_messages(fl, jobs, old_rotas, status)  # Record what it wrote
+        status.close()
+        raise SystemExit(0)
+    signal.signal(signal.SIGTERM, on_sigterm)
     while not finished:
         try:
             counter += 1
-
-            mouse_position_before_sleep = pa.position()
             time.sleep(sleep_time)
-            mouse_position_after_sleep = pa.position()
+            if not fl.ensure_alive():
+                status.event('worker', "Filler worker died, restarted")
+                if jobs.in_flight:
+                    job = jobs.fail(jobs.in_flight, "Filler worker died mid-fill")
+                    status.event('fill_error', f"{job['rota_name']} ({job['state']}): {job['error']}")
+            elif jobs.in_flight and time.monotonic() - jobs.started > fill_timeout:
+                fl.restart()  # Keeps the messages it sent, e.g which shifts it wrote
+                job = jobs.fail(jobs.in_flight, f"Timed out after {fill_timeout} secs")
+                status.event('fill_error', f"{job['rota_name']} ({job['state']}): {job['error']}")
+            if fl.afk_mode != afk_mode:  # AFK is detected by the filler worker
+                afk_mode = fl.afk_mode
+                status.event('afk', f"AFK mode {'on' if afk_mode else 'off'}")
+
+            num_rotas_autofilled += handle_messages(fl, jobs, old_rotas, status)
+            dispatch(fl, jobs, roster, status)
 
             if counter % 300 == 0:
-                print("")
-                print("Refreshing access token...")
-                print("")
+                status.event('token', "Refreshing access token")
                 gc.refresh_access_token()  # We don't need to refresh every single loop
-                # Detect whether the user is afk
-                # If the x-coord of the mouse doesn't change after sleeping
-                # then only move the y-coordinate of the mouse
-                print("Checking for AFK...")
-                print("")
-                if mouse_position_before_sleep[0] == mouse_position_after_sleep[0]:
-                    afk_mode = True
-                    print("AFK mode activated!")
-                    print("")
-
-            if mouse_position_before_sleep[0] != mouse_position_after_sleep[0]:
-                afk_mode = False  # Deactivate AFK mode
-
-            if afk_mode:
-                # Move the cursor vertically down the screen
-                pa.moveTo((500, (30*counter % 700)+100))
-
+                gc.save_tokens(token_cache_path)
 
             drive_items_response = gc.get_driveItems(relative_path)
-            time_elapsed = str(dt.now() - start_time).split('.')[0]
             try:
                 drive_items = drive_items_response['value']
-                print("--------------------------")
-                print(f"Scanning {drive} drive...")
-                print(f"Check: {counter}")
-                print(f"Refresh time: {sleep_time} secs")
-                print(f"AFK: {afk_mode}")
-                print(f"Time elapsed: {time_elapsed}")
-                print(f"Errors: {error_log}")
-                print(f"Rotas autofilled: {num_rotas_autofilled}")
-                rotas = [(item['name'], item['webUrl']) for item in drive_items]
-                print(f"DriveItems detected: {len(rotas)}")
+                rotas = [(item['name'], item['webUrl'], item.get('createdDateTime'))
+                         for item in drive_items]
+                status.update(drive_items=len(rotas))
                 for rota in rotas:
-                    print(rota[0])
-                    rota_name, rota_url = rota
-                    # Check file is not an old rota and also is an excel spreadsheet
-                    if rota_name not in old_rotas and rota_name.split('.')[-1] == 'xlsx':
-                        print(f"New rota detected: {rota_name}")
-                        if play_music:  # Only trigger once
-                            try:
-                                # Pause any currently playing media
-                                os.system('playerctl stop')
-                                print("Music paused!")
-                            except:
-                                print("Error pausing media!")
-                            try:
-                                song = vlc.MediaPlayer('music.mp3')
-                                song.play()
-                            except:
-                                print("Error playing music!")
-                            play_music = False
-
-                        print("Engaging autofiller!")
-                        af.autofill_shifts(
-                            shift_list=shift_list, rota_url=rota_url)
-                        with open('old_rotas.txt', 'a') as f:
-                            # Append old rotas with new rota
-                            f.write(rota_name + '\n')
-                        print(f"Appending {rota_name} to old_rotas.txt...")
-                        old_rotas.append(rota_name)
-                        # finished = True
-                        num_rotas_autofilled += 1
+                    rota_name, rota_url, created = rota
+                    # Check file is not an old or queued rota and also is an excel spreadsheet
+                    if rota_name not in old_rotas and rota_name not in jobs \
+                            and rota_name.split('.')[-1] == 'xlsx':
+                        status.event('new', f"New rota detected: {rota_name}")
+                        jobs.add(rota_name, rota_url, created)
+                dispatch(fl, jobs, roster, status)
 
             except KeyError:
-                print("--------------------------")
-                print(f"Scanning {drive} drive...")
-                print(f"Check: {counter}")
-                print(f"Refresh time: {sleep_time} secs")
-                print(f"AFK: {afk_mode}")
-                print(f"Time elapsed: {time_elapsed}")
-                print(f"Errors: {error_log}")
-                print(f"Rotas autofilled: {num_rotas_autofilled}")
-                print(f"{relative_path} {drive_items_response['error']['code']}")
-                print(drive_items_response['error']['message'])
+                error = drive_items_response['error']
+                status.update(drive_items=error['code'])
+                status.event('drive', f"{relative_path} {error['code']}: {error['message']}")
+
+            status.update(check=counter, afk=afk_mode, autofilled=num_rotas_autofilled,
+                          filling=jobs.in_flight, queued=len(jobs.pending()))
+            # Don't redraw over the filler worker's output
+            status.scrolling = jobs.in_flight is not None
+            status.render()
 
         except KeyboardInterrupt:  # Toggle Away From Keyboard mode using ctrl-c
-            print("Keyboard interrupt detected!")
-            if afk_mode:
-                afk_mode = False
-                print("AFK mode off!")
-            else:
-                afk_mode = True
-                print("AFK mode on!")
+            afk_mode = fl.toggle_afk()
+            status.event('afk', f"AFK mode {'on' if afk_mode else 'off'}")
+            status.update(afk=afk_mode)
+            status.render(force=True)
 
         except Exception as e:
-            print(e)
-            print("")
-            print("Error occured...")
-            print("Appending Error Log...")
-
-            with open('error_log.txt', 'a') as f:
-                f.write(str(dt.now()) + ': ' + str(e) + '\n')
-
-            print("")
-            print("Sleeping...")
-            error_log.append(type(e).__name__)
+            status.error(e)  # Counted by type and logged in the background
+            status.render(force=True)
             time.sleep(10)
             # sleep_time = 10
-            print("Retrying...")
 
+    fl.stop()
+    status.close()
     print("")
     print("FINISHED.")
     print("")
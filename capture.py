@@ -0,0 +1,312 @@
+import ctypes
+import ctypes.util
+import os
+import sys
+from collections import OrderedDict
+import numpy as np
+
+
+class PyAutoGuiCapture:
+    """
+    Capture backend using pyautogui.screenshot.
+    Works everywhere pyautogui does, but round-trips a full PIL image
+    per grab (and shells out to scrot/gnome-screenshot on some Linux setups).
+    """
+    name = 'pyautogui'
+
+    def __init__(self):
+        import pyautogui
+        self.pa = pyautogui
+        self.screen_size = tuple(pyautogui.size())
+
+    def grab(self, region):
+        """
+        Grab a region of the screen.
+
+        Parameters
+        ----------
+        region : tuple[int]
+            (left, top, width, height) of the region to grab.
+
+        Returns
+        -------
+        frame : np.ndarray
+            (height, width, 3) RGB array of the region.
+        """
+        return np.asarray(self.pa.screenshot(region=tuple(region)))[..., :3]
+
+    def close(self):
+        pass
+
+
+class FileCapture:
+    """
+    Fake capture backend which grabs regions of an image, e.g a saved
+    screenshot of a rota, for testing without a display.
+
+    Attributes
+    ----------
+    screen : np.ndarray
+        (height, width, 3) RGB array used as the screen.
+
+    screen_size : tuple[int]
+        (width, height) of the screen.
+    """
+    name = 'file'
+
+    def __init__(self, screen):
+        self.screen = None
+        self.set_screen(screen)
+
+    def set_screen(self, screen):
+        """Replace the screen with an image path, PIL image or array."""
+        if isinstance(screen, str):
+            from PIL import Image
+            screen = Image.open(screen).convert('RGB')
+        self.screen = np.asarray(screen, dtype=np.uint8)[..., :3]
+        self.screen_size = (self.screen.shape[1], self.screen.shape[0])
+
+    def grab(self, region):
+        """Grab a region of the screen, as a view of the screen array."""
+        left, top, width, height = region
+        return self.screen[top:top+height, left:left+width]
+
+    def close(self):
+        pass
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [('shmseg', ctypes.c_ulong), ('shmid', ctypes.c_int),
+                ('shmaddr', ctypes.c_void_p), ('readOnly', ctypes.c_int)]
+
+
+class XImage(ctypes.Structure):
+    # Only the leading fields we need, we never allocate one ourselves
+    _fields_ = [('width', ctypes.c_int), ('height', ctypes.c_int),
+                ('xoffset', ctypes.c_int), ('format', ctypes.c_int),
+                ('data', ctypes.c_void_p), ('byte_order', ctypes.c_int),
+                ('bitmap_unit', ctypes.c_int), ('bitmap_bit_order', ctypes.c_int),
+                ('bitmap_pad', ctypes.c_int), ('depth', ctypes.c_int),
+                ('bytes_per_line', ctypes.c_int), ('bits_per_pixel', ctypes.c_int)]
+
+
+class X11ShmCapture:
+    """
+    Capture backend using the X11 MIT-SHM extension, so the X server
+    writes pixels straight into shared memory which we read as a NumPy
+    view without any extra copies.
+
+    One shared memory image is kept per region size and reused between
+    grabs, so repeated grabs of the same size (e.g cells or the region
+    of interest) don't reallocate. The returned frame is a view of that
+    buffer, so its pixels are overwritten by the next grab of the same
+    size, copy it if you need to keep them. The buffer itself stays
+    alive while any view of it does: buffers with live views are never
+    evicted, only freed by close().
+
+    Attributes
+    ----------
+    max_buffers : int
+        Maximum number of region sizes to keep buffers for.
+
+    screen_size : tuple[int]
+        (width, height) of the screen.
+    """
+    name = 'x11'
+
+    ZPIXMAP = 2
+    IPC_PRIVATE = 0
+    IPC_CREAT = 0o1000
+    IPC_RMID = 0
+    ALL_PLANES = 0xFFFFFFFF
+
+    def __init__(self, max_buffers=4):
+        self.max_buffers = max_buffers
+        self.buffers = OrderedDict() # (width, height) -> (image, shminfo, frame, owner)
+        self.base_refs = None # References to a buffer's owner array held by us
+        self.xlib, self.xext, self.libc = self.load_libraries()
+        self.display = self.xlib.XOpenDisplay(None)
+        if not self.display:
+            raise OSError("Could not open the X display, is DISPLAY set?")
+        if not self.xext.XShmQueryExtension(self.display):
+            self.xlib.XCloseDisplay(self.display)
+            raise OSError("X server does not support the MIT-SHM extension")
+        screen = self.xlib.XDefaultScreen(self.display)
+        self.root = self.xlib.XRootWindow(self.display, screen)
+        self.visual = self.xlib.XDefaultVisual(self.display, screen)
+        self.depth = self.xlib.XDefaultDepth(self.display, screen)
+        self.screen_size = (self.xlib.XDisplayWidth(self.display, screen),
+                            self.xlib.XDisplayHeight(self.display, screen))
+
+    @staticmethod
+    def load_libraries():
+        """Load libX11, libXext and libc and declare the functions we use."""
+        paths = [ctypes.util.find_library(lib) for lib in ('X11', 'Xext', 'c')]
+        if not paths[0] or not paths[1]:
+            raise OSError("Could not find libX11 and libXext")
+        xlib, xext = ctypes.CDLL(paths[0]), ctypes.CDLL(paths[1])
+        libc = ctypes.CDLL(paths[2], use_errno=True)
+        display, ulong, c_int = ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int
+        shminfo_p, ximage_p = ctypes.POINTER(XShmSegmentInfo), ctypes.POINTER(XImage)
+
+        xlib.XOpenDisplay.argtypes, xlib.XOpenDisplay.restype = [ctypes.c_char_p], display
+        xlib.XCloseDisplay.argtypes = [display]
+        for func in ('XDefaultScreen',):
+            getattr(xlib, func).argtypes, getattr(xlib, func).restype = [display], c_int
+        for func in ('XDefaultDepth', 'XDisplayWidth', 'XDisplayHeight'):
+            getattr(xlib, func).argtypes, getattr(xlib, func).restype = [display, c_int], c_int
+        xlib.XRootWindow.argtypes, xlib.XRootWindow.restype = [display, c_int], ulong
+        xlib.XDefaultVisual.argtypes, xlib.XDefaultVisual.restype = [display, c_int], ctypes.c_void_p
+        xlib.XSync.argtypes = [display, c_int]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+
+        xext.XShmQueryExtension.argtypes, xext.XShmQueryExtension.restype = [display], c_int
+        xext.XShmCreateImage.argtypes = [display, ctypes.c_void_p, ctypes.c_uint, c_int,
+                                         ctypes.c_void_p, shminfo_p, ctypes.c_uint, ctypes.c_uint]
+        xext.XShmCreateImage.restype = ximage_p
+        xext.XShmAttach.argtypes, xext.XShmAttach.restype = [display, shminfo_p], c_int
+        xext.XShmDetach.argtypes, xext.XShmDetach.restype = [display, shminfo_p], c_int
+        xext.XShmGetImage.argtypes = [display, ulong, ximage_p, c_int, c_int, ulong]
+        xext.XShmGetImage.restype = c_int
+
+        libc.shmget.argtypes, libc.shmget.restype = [c_int, ctypes.c_size_t, c_int], c_int
+        libc.shmat.argtypes, libc.shmat.restype = [c_int, ctypes.c_void_p, c_int], ctypes.c_void_p
+        libc.shmdt.argtypes, libc.shmdt.restype = [ctypes.c_void_p], c_int
+        libc.shmctl.argtypes, libc.shmctl.restype = [c_int, c_int, ctypes.c_void_p], c_int
+        return xlib, xext, libc
+
+    def get_buffer(self, width, height):
+        """
+        Get the shared memory image and its NumPy view for a region size,
+        creating it if needed and evicting the least recently used one
+        which has no live views.
+        """
+        key = (width, height)
+        if key in self.buffers:
+            self.buffers.move_to_end(key)
+            return self.buffers[key]
+
+        self.buffers[key] = self.create_buffer(width, height)
+        if self.base_refs is None: self.base_refs = self.count_refs(key)
+        for old_key in list(self.buffers)[:-1]:
+            if len(self.buffers) <= self.max_buffers: break
+            # Freeing a buffer which is still viewed would segfault on access
+            if self.count_refs(old_key) <= self.base_refs:
+                self.free_buffer(*self.buffers.pop(old_key)[:2])
+        return self.buffers[key]
+
+    def count_refs(self, key):
+        """Count the references to the array owning a buffer, i.e ours plus any views."""
+        return sys.getrefcount(self.buffers[key][3])
+
+    def create_buffer(self, width, height):
+        """Create a shared memory image and its RGB NumPy view."""
+        shminfo = XShmSegmentInfo()
+        image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, self.ZPIXMAP,
+                                          None, ctypes.byref(shminfo), width, height)
+        if not image:
+            raise OSError("XShmCreateImage failed")
+        if image.contents.bits_per_pixel != 32:
+            self.xlib.XFree(image)
+            raise OSError(f"Unsupported pixel format: {image.contents.bits_per_pixel} bits per pixel")
+        bytes_per_line = image.contents.bytes_per_line
+        size = bytes_per_line * height
+        shminfo.shmid = self.libc.shmget(self.IPC_PRIVATE, size, self.IPC_CREAT | 0o600)
+        if shminfo.shmid < 0:
+            self.xlib.XFree(image)
+            raise OSError(ctypes.get_errno(), "shmget failed")
+        shminfo.shmaddr = self.libc.shmat(shminfo.shmid, None, 0)
+        if shminfo.shmaddr in (None, ctypes.c_void_p(-1).value):  # (void *) -1 on failure
+            errno = ctypes.get_errno()
+            self.libc.shmctl(shminfo.shmid, self.IPC_RMID, None)
+            self.xlib.XFree(image)
+            raise OSError(errno, "shmat failed")
+        shminfo.readOnly = 0
+        image.contents.data = shminfo.shmaddr
+        self.xext.XShmAttach(self.display, ctypes.byref(shminfo))
+        self.xlib.XSync(self.display, 0)
+        # Marked for removal now, it is freed once both sides detach
+        self.libc.shmctl(shminfo.shmid, self.IPC_RMID, None)
+
+        # BGRX in memory, so reverse the first three channels to get an RGB view
+        raw = (ctypes.c_ubyte * size).from_address(shminfo.shmaddr)
+        # Every view of the buffer has owner as its base, so counting the
+        # references to owner tells us if any views are still alive
+        owner = np.ctypeslib.as_array(raw)
+        frame = owner.reshape(height, bytes_per_line // 4, 4)[:, :width, 2::-1]
+        return image, shminfo, frame, owner
+
+    def free_buffer(self, image, shminfo):
+        """Detach and free a shared memory image."""
+        self.xext.XShmDetach(self.display, ctypes.byref(shminfo))
+        self.xlib.XSync(self.display, 0)
+        self.libc.shmdt(shminfo.shmaddr)
+        self.xlib.XFree(image)
+
+    def grab(self, region):
+        """
+        Grab a region of the screen into its reusable shared memory buffer.
+
+        Parameters
+        ----------
+        region : tuple[int]
+            (left, top, width, height) of the region to grab.
+
+        Returns
+        -------
+        frame : np.ndarray
+            (height, width, 3) RGB view of the buffer.
+        """
+        left, top, width, height = (int(v) for v in region)
+        # X errors kill the process by default, so check the bounds ourselves
+        if left < 0 or top < 0 or left + width > self.screen_size[0] \
+                or top + height > self.screen_size[1] or width <= 0 or height <= 0:
+            raise ValueError(f"Region {region} is not on the screen {self.screen_size}")
+        image, shminfo, frame, owner = self.get_buffer(width, height)
+        if not self.xext.XShmGetImage(self.display, self.root, image, left, top, self.ALL_PLANES):
+            raise OSError("XShmGetImage failed")
+        return frame[...]  # A new view, so that it counts as live
+
+    def close(self):
+        """Free all buffers, invalidating any views of them, and close the display."""
+        while self.buffers:
+            self.free_buffer(*self.buffers.popitem()[1][:2])
+        if self.display:
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+def get_backend(name='auto', **kwargs):
+    """
+    Get a capture backend by name.
+
+    Parameters
+    ----------
+    name : str
+        'x11', 'pyautogui', 'file' or 'auto'. 'auto' uses the X11
+        shared memory backend where available and falls back to pyautogui.
+
+    **kwargs
+        Passed on to the backend, e.g screen for the file backend.
+
+    Returns
+    -------
+    backend : object
+        Capture backend with grab(region) and close() methods.
+    """
+    if name == 'x11':
+        return X11ShmCapture(**kwargs)
+    elif name == 'pyautogui':
+        return PyAutoGuiCapture(**kwargs)
+    elif name == 'file':
+        return FileCapture(**kwargs)
+    elif name == 'auto':
+        if sys.platform.startswith('linux') and os.environ.get('DISPLAY'):
+            try:
+                return X11ShmCapture(**kwargs)
+            except OSError as e:
+                print(f"X11 capture unavailable ({e}), using pyautogui...")
+        return PyAutoGuiCapture()
+    else:
+        raise ValueError(f"{name} is not a valid capture backend! "
+                         "Use either 'auto', 'x11', 'pyautogui' or 'file'.")
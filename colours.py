@@ -0,0 +1,189 @@
+import json
+import os
+import numpy as np
+
+
+class ColourClassifier:
+    """
+    Classifies pixel colours into rota cell colour classes using a
+    precomputed lookup table over quantized RGB values, so that classifying
+    a whole image is a single indexed gather.
+
+    Class 0 is anything we don't care about (white, greys, text etc.),
+    class 1 is the black cell border and classes 2, 3, ... correspond to
+    the cell colours in palette, in order.
+
+    Attributes
+    ----------
+    palette : list[tuple[int]]
+        List of cell colours, excluding black.
+        E.g palette = [(146,208,80), (248,203,173), (68,114,196)]
+
+    threshold : int
+        The maximum distance between a colour and a palette colour
+        for it to be considered the same shade.
+
+    min_brightness : int
+        Colours with an (R + G + B) sum below this are never matched to a
+        palette colour, so that we don't get any dark greys.
+
+    bits : int
+        Number of bits kept per channel when quantizing.
+
+    learned : bool
+        True if the palette was learned from a screenshot and not yet saved.
+
+    lut : np.ndarray
+        (2**bits, 2**bits, 2**bits) array mapping quantized RGB to class.
+    """
+    UNKNOWN = 0
+    BORDER = 1
+
+    def __init__(self, palette, threshold=35, min_brightness=100, bits=6, learned=False):
+        # Black is the border class, not a cell colour
+        self.palette = [tuple(int(c) for c in col) for col in palette if tuple(col) != (0,0,0)]
+        self.threshold = threshold
+        self.min_brightness = min_brightness
+        self.bits = bits
+        self.learned = learned
+        self.lut = self.build_lut()
+
+    def build_lut(self):
+        """
+        Build the quantized RGB -> class lookup table by matching the
+        centre of every quantized bin to the nearest palette colour.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        lut : np.ndarray
+            (2**bits, 2**bits, 2**bits) uint8 array of classes.
+        """
+        n_bins = 2 ** self.bits
+        step = 256 // n_bins
+        centres = np.arange(n_bins) * step + step // 2
+        r, g, b = np.meshgrid(centres, centres, centres, indexing='ij')
+        bin_cols = np.stack([r, g, b], axis=-1).reshape(-1, 1, 3)
+
+        lut = np.full(n_bins ** 3, self.UNKNOWN, dtype=np.uint8)
+        if self.palette:
+            dists = np.linalg.norm(bin_cols - np.array(self.palette).reshape(1, -1, 3), axis=-1)
+            nearest = np.argmin(dists, axis=1)
+            matched = (dists[np.arange(len(nearest)), nearest] < self.threshold) \
+                & (bin_cols.reshape(-1, 3).sum(axis=1) > self.min_brightness)
+            lut[matched] = nearest[matched] + 2
+
+        lut = lut.reshape(n_bins, n_bins, n_bins)
+        lut[0, 0, 0] = self.BORDER
+        return lut
+
+    def classify(self, pixels):
+        """
+        Classify an image or any array of RGB(A) colours.
+
+        Parameters
+        ----------
+        pixels : PIL.Image.Image or array_like
+            Image or (..., 3) array of colours.
+
+        Returns
+        -------
+        classes : np.ndarray
+            uint8 array of classes with the same leading shape as pixels.
+        """
+        q = np.asarray(pixels, dtype=np.uint8)[..., :3] >> (8 - self.bits)
+        return self.lut[q[..., 0], q[..., 1], q[..., 2]]
+
+    def same_class(self, colour_one, colour_two):
+        """Check if two colours fall into the same class."""
+        classes = self.classify([colour_one, colour_two])
+        return classes[0] == classes[1]
+
+    @classmethod
+    def learn(cls, img, n_colours=None, min_share=0.005, min_saturation=40, **kwargs):
+        """
+        Learn the palette by clustering the dominant saturated colours
+        of a screenshot of the rota table.
+
+        Parameters
+        ----------
+        img : PIL.Image.Image or np.ndarray
+            Screenshot containing the rota table.
+
+        n_colours : int
+            Number of cell colours to keep. If None, every colour
+            covering at least min_share of the screenshot is kept.
+
+        min_share : float
+            Minimum fraction of the screenshot a colour must cover.
+
+        min_saturation : int
+            Minimum (max - min) channel spread, to ignore white,
+            greys and black.
+
+        **kwargs
+            Passed on to the ColourClassifier constructor.
+
+        Returns
+        -------
+        classifier : ColourClassifier
+            Classifier built from the learned palette.
+        """
+        classifier_kwargs = {'threshold': 35, 'bits': 6, **kwargs}
+        threshold, bits = classifier_kwargs['threshold'], classifier_kwargs['bits']
+        pixels = np.asarray(img, dtype=np.uint8)[..., :3].reshape(-1, 3)
+        n_pixels = len(pixels)
+        saturation = pixels.max(axis=1).astype(int) - pixels.min(axis=1)
+        pixels = pixels[saturation >= min_saturation]
+
+        # Histogram the quantized colours, keeping the mean colour of each bin
+        q = (pixels >> (8 - bits)).astype(np.int64)
+        idx = (q[:, 0] << (2 * bits)) | (q[:, 1] << bits) | q[:, 2]
+        counts = np.bincount(idx, minlength=2 ** (3 * bits))
+        sums = np.stack([np.bincount(idx, weights=pixels[:, c], minlength=len(counts))
+                         for c in range(3)], axis=-1)
+
+        # Greedily merge bins into clusters, most common first
+        clusters = [] # [mean colour, count]
+        for b in np.argsort(counts)[::-1]:
+            if counts[b] < min_share * n_pixels: break
+            col = sums[b] / counts[b]
+            for cluster in clusters:
+                if np.linalg.norm(cluster[0] - col) < threshold:
+                    total = cluster[1] + counts[b]
+                    cluster[0] = (cluster[0] * cluster[1] + col * counts[b]) / total
+                    cluster[1] = total
+                    break
+            else:
+                clusters.append([col, counts[b]])
+
+        clusters.sort(key=lambda cluster: cluster[1], reverse=True)
+        palette = [tuple(int(round(c)) for c in cluster[0]) for cluster in clusters[:n_colours]]
+        print(f"Learned palette: {palette}")
+        return cls(palette, learned=True, **classifier_kwargs)
+
+    @classmethod
+    def load(cls, path, template, **kwargs):
+        """
+        Load the saved palette for template from the json file at path.
+        Returns None if there is no saved palette.
+        """
+        if not os.path.exists(path): return None
+        with open(path, 'r') as f:
+            palettes = json.load(f)
+        if template not in palettes: return None
+        return cls(palettes[template], **kwargs)
+
+    def save(self, path, template):
+        """Save the palette for template to the json file at path."""
+        palettes = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                palettes = json.load(f)
+        palettes[template] = [list(col) for col in self.palette]
+        with open(path, 'w') as f:
+            json.dump(palettes, f, indent=4)
+        self.learned = False
@@ -0,0 +1,231 @@
+import multiprocessing as mp
+import queue
+import signal
+import os
+import re
+import sys
+
+PR_SET_PDEATHSIG = 1
+
+
+def play_alarm():
+    """Pause any currently playing media and play music.mp3."""
+    try:
+        # Pause any currently playing media
+        os.system('playerctl stop')
+        print("Music paused!")
+    except:
+        print("Error pausing media!")
+    try:
+        import vlc  # Only loaded when we actually need to play music
+        song = vlc.MediaPlayer('music.mp3')
+        song.play()
+        return song  # Keep a reference, or the song stops playing
+    except:
+        print("Error playing music!")
+
+
+def exit_with_parent():
+    """
+    Have the kernel send the worker SIGTERM when the watcher dies, even if
+    it is killed rather than exiting normally, so an orphaned worker never
+    keeps filling while a restarted watcher forks another one. Linux only,
+    elsewhere we rely on checking the parent pid. Returns the parent pid.
+    """
+    parent = os.getppid()
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+    except (OSError, AttributeError):  # Not Linux
+        pass
+    return parent
+
+
+def worker_loop(jobs, results, afk_event, screen_region, colours, n_colours,
+                play_music, idle_time):
+    """
+    Filler worker process.
+    Imports the GUI and vision dependencies once, then fills rotas
+    from the jobs queue. Puts ('written', rota_name, [name, shift]) on
+    the results queue just before each shift is written,
+    ('progress', rota_name, [name, shift]) as each shift is confirmed and
+    ('done', rota_name, report) when the rota is finished.
+    While idle, keeps the screen awake if AFK mode is on.
+    Exits as soon as the watcher dies.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # ctrl-c is for the watcher
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)  # Not the watcher's handler
+    parent = exit_with_parent()
+    import pyautogui as pa
+    import autofiller  # Pulls in PIL and numpy
+    af = autofiller.Autofill(screen_region=screen_region, colours=colours,
+                             n_colours=n_colours)
+    song = None
+    counter = 0
+    while True:
+        if os.getppid() != parent:  # Orphaned, e.g the watcher was killed
+            print("Watcher died, stopping filler worker...")
+            break
+        counter += 1
+        mouse_position_before_sleep = pa.position()
+        try:
+            job = jobs.get(timeout=idle_time)
+        except queue.Empty:
+            job = None
+        else:
+            if job == 'stop': break
+
+        if job is None:  # Idle, so check for AFK
+            mouse_position_after_sleep = pa.position()
+            # If the x-coord of the mouse doesn't change after sleeping
+            # then only move the y-coordinate of the mouse
+            if mouse_position_before_sleep[0] != mouse_position_after_sleep[0]:
+                afk_event.clear()  # Deactivate AFK mode
+            elif counter % 300 == 0 and not afk_event.is_set():
+                afk_event.set()  # Shown on the watcher's status
+            if afk_event.is_set():
+                # Move the cursor vertically down the screen
+                pa.moveTo((500, (30*counter % 700)+100))
+            continue
+
+        rota_name, rota_url, roster = job
+        if play_music:  # Only trigger once
+            song = play_alarm()
+            play_music = False
+        print("Engaging autofiller!")
+        # E.g WE190322.xlsx -> WE.xlsx
+        template = re.sub(r'\d+', '', rota_name)
+        def on_write(name, shift):
+            if os.getppid() != parent:  # Never write for a dead watcher
+                sys.exit("Watcher died mid-fill, stopping filler worker")
+            results.put(('written', rota_name, [name, shift]))
+        def on_confirm(name, shift):
+            results.put(('progress', rota_name, [name, shift]))
+        try:
+            report = af.autofill_shifts(
+                shift_list=roster, rota_url=rota_url, template=template,
+                on_confirm=on_confirm, on_write=on_write)
+        except Exception as e:
+            report = {'error': f"{type(e).__name__}: {e}"}
+        results.put(('done', rota_name, report))
+
+
+class Filler:
+    """
+    Pre-forked filler worker, so that the watcher process never has to
+    import pyautogui, PIL, NumPy or vlc itself. The worker imports them
+    once at start up, so it is ready to go when a new rota drops.
+
+    Attributes
+    ----------
+    screen_region : tuple[int]
+        Region of the screen to be autofilled.
+
+    colours : list[tuple[int]]
+        Seed cell colours, see autofiller.Autofill.
+
+    n_colours : int
+        Number of cell colours to learn, see autofiller.Autofill.
+
+    play_music : bool
+        Whether to play music when the first rota is filled.
+
+    idle_time : float
+        Seconds the worker waits for a job before checking for AFK.
+
+    afk_event : multiprocessing.Event
+        Set while AFK mode is on. Shared with the worker.
+    """
+    def __init__(self, screen_region, colours=None, n_colours=None,
+                 play_music=True, afk_mode=False, idle_time=2):
+        self.screen_region = screen_region
+        self.colours = colours
+        self.n_colours = n_colours
+        self.play_music = play_music
+        self.idle_time = idle_time
+        self.afk_event = mp.Event()
+        if afk_mode: self.afk_event.set()
+        self.jobs = None
+        self.results = None
+        self.process = None
+        self.leftover = []
+        self.start()
+
+    def start(self):
+        """(Re)start the worker process with fresh queues."""
+        self.jobs = mp.Queue()
+        self.results = mp.Queue()
+        self.process = mp.Process(
+            target=worker_loop,
+            args=(self.jobs, self.results, self.afk_event, self.screen_region,
+                  self.colours, self.n_colours, self.play_music, self.idle_time),
+            daemon=True)
+        self.process.start()
+
+    def ensure_alive(self):
+        """Restart the worker if it has died. Returns False if it had died."""
+        if self.process.is_alive(): return True
+        self.restart()
+        return False
+
+    def restart(self):
+        """Kill the worker, e.g if it hangs, and start a fresh one."""
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=10)
+        # Keep what it sent before dying, e.g which shifts it wrote
+        self.leftover = self.poll()
+        self.start()
+
+    def submit(self, rota_name, rota_url, roster):
+        """Queue a rota to be filled with a compiled roster."""
+        self.jobs.put((rota_name, rota_url, roster))
+        self.play_music = False  # The worker only plays music once
+
+    def next_message(self):
+        """
+        Get the next (kind, rota_name, payload) message from the worker
+        without blocking, or None if there isn't one, see worker_loop.
+        """
+        if self.leftover: return self.leftover.pop(0)
+        try:
+            return self.results.get_nowait()
+        except queue.Empty:
+            return None
+
+    def poll(self):
+        """
+        Get all of the (kind, rota_name, payload) messages from the worker
+        without blocking, see worker_loop.
+        """
+        messages, self.leftover = self.leftover, []
+        while True:
+            try:
+                messages.append(self.results.get_nowait())
+            except queue.Empty:
+                return messages
+
+    @property
+    def afk_mode(self):
+        return self.afk_event.is_set()
+
+    def toggle_afk(self):
+        """Toggle AFK mode, returns the new state."""
+        if self.afk_event.is_set():
+            self.afk_event.clear()
+        else:
+            self.afk_event.set()
+        return self.afk_event.is_set()
+
+    def stop(self, timeout=10):
+        """
+        Stop the worker once it has finished its current job, killing it
+        if it hasn't within timeout secs. A killed fill is resumed, without
+        its written shifts, by the next watcher.
+        """
+        self.jobs.put('stop')
+        self.process.join(timeout=timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout=10)
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+import time
+from datetime import date
+
+
+def get_week(rota_name):
+    """
+    Get the week ending date of a rota from its name,
+    e.g WE190322.xlsx -> '2022-03-19', or None if it doesn't have one.
+    """
+    match = re.search(r'(\d{2})(\d{2})(\d{2})', rota_name)
+    if not match: return None
+    day, month, year = (int(group) for group in match.groups())
+    try:
+        return date(2000 + year, month, day).isoformat()
+    except ValueError:
+        return None
+
+
+class JobQueue:
+    """
+    Persistent priority queue of rotas to fill, newest week first.
+    Each job keeps its own state and outcome, saved to path on every
+    change, so after a crash an unfinished fill is resumed (skipping the
+    shifts already written) instead of the rota being skipped.
+
+    Attributes
+    ----------
+    path : str
+        Path of the json file the jobs are saved to.
+
+    max_attempts : int
+        Number of failed attempts before a job is given up on.
+
+    jobs : dict[str, dict]
+        Jobs keyed by rota name. Each job has the rota_name, rota_url,
+        week, created (drive item creation time), state, attempts,
+        filled (list of [name, shift] confirmed so far), written (list of
+        [name, shift] written but not yet confirmed) and the report or
+        error of the last attempt.
+
+    in_flight : str or None
+        Name of the rota currently being filled.
+
+    started : float or None
+        time.monotonic() when the in-flight rota was handed out.
+    """
+    QUEUED = 'queued'
+    FILLING = 'filling'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, path='jobs.json', max_attempts=3):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.jobs = {}
+        self.in_flight = None
+        self.started = None
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self.jobs = json.load(f)
+        for job in self.jobs.values():
+            job.setdefault('written', [])
+            if job['state'] == self.FILLING:  # Interrupted mid-fill
+                print(f"Resuming {job['rota_name']}...")
+                job['state'] = self.QUEUED
+        self.save()
+
+    def __contains__(self, rota_name):
+        return rota_name in self.jobs
+
+    def save(self):
+        """Save the jobs, replacing the file in one go so a crash can't corrupt it."""
+        with open(self.path + '.tmp', 'w') as f:
+            json.dump(self.jobs, f, indent=4)
+        os.replace(self.path + '.tmp', self.path)
+
+    def add(self, rota_name, rota_url, created=None):
+        """Queue a newly detected rota."""
+        job = {'rota_name': rota_name, 'rota_url': rota_url,
+               'week': get_week(rota_name), 'created': created or '',
+               'state': self.QUEUED, 'attempts': 0, 'filled': [],
+               'written': [], 'report': None, 'error': None}
+        self.jobs[rota_name] = job
+        self.save()
+        return job
+
+    def priority(self, job):
+        """Newest week first, then the most recently uploaded."""
+        return (job['week'] or '', job['created'])
+
+    def pending(self):
+        """Get the queued jobs, highest priority first."""
+        queued = [job for job in self.jobs.values() if job['state'] == self.QUEUED]
+        return sorted(queued, key=self.priority, reverse=True)
+
+    def next(self):
+        """Mark the highest priority queued job as filling and return it, or None."""
+        pending = self.pending()
+        if not pending: return None
+        job = pending[0]
+        job['state'] = self.FILLING
+        self.in_flight = job['rota_name']
+        self.started = time.monotonic()
+        self.save()
+        return job
+
+    def written(self, rota_name, written_shift):
+        """
+        Record a [name, shift] about to be written, before it is confirmed,
+        so a resumed fill never writes it twice.
+        """
+        self.jobs[rota_name]['written'].append(written_shift)
+        self.save()
+
+    def progress(self, rota_name, filled_shift):
+        """Record a confirmed [name, shift], so a resumed fill skips it."""
+        job = self.jobs[rota_name]
+        job['filled'].append(filled_shift)
+        if filled_shift in job['written']: job['written'].remove(filled_shift)
+        self.save()
+
+    def skipped(self, rota_name):
+        """
+        Get the [name, shift]s a resumed fill must skip: those confirmed,
+        and those written but never confirmed, which we can't tell apart
+        from someone else's name in the cell, so are dropped from the plan.
+        """
+        job = self.jobs[rota_name]
+        return job['filled'] + job['written']
+
+    def finish(self, rota_name, report):
+        """Record the report of a fill, returns the job."""
+        job = self.jobs[rota_name]
+        if 'error' in report:
+            return self.fail(rota_name, report['error'])
+        job['state'] = self.DONE
+        job['report'] = report
+        job['error'] = None
+        self.in_flight = None
+        self.save()
+        return job
+
+    def fail(self, rota_name, error):
+        """Record a failed attempt, re-queueing the job unless it is out of attempts."""
+        job = self.jobs[rota_name]
+        job['attempts'] += 1
+        job['error'] = error
+        if job['attempts'] >= self.max_attempts:
+            job['state'] = self.FAILED
+        else:
+            job['state'] = self.QUEUED
+        if self.in_flight == rota_name: self.in_flight = None
+        self.save()
+        return job
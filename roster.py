@@ -0,0 +1,236 @@
+import json
+from collections import namedtuple
+
+DAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+TIMES = ['morning', 'afternoon', 'evening']
+# Shifts in the order they appear on the rota, e.g SHIFTS[18] = 'sunday morning'
+SHIFTS = [f"{day} {time}" for day in DAYS for time in TIMES]
+SHIFT_TO_INT = {shift: i for i, shift in enumerate(SHIFTS)}
+
+DAY_ALIASES = {
+    'mon': 'monday', 'tue': 'tuesday', 'tues': 'tuesday', 'wed': 'wednesday',
+    'thu': 'thursday', 'thur': 'thursday', 'thurs': 'thursday', 'fri': 'friday',
+    'sat': 'saturday', 'sun': 'sunday',
+    }
+TIME_ALIASES = {
+    'am': 'morning', 'morn': 'morning', 'pm': 'afternoon', 'aft': 'afternoon',
+    'eve': 'evening', 'night': 'evening',
+    }
+
+# A single shift to fill, i.e name wants shift SHIFTS[shift_num]
+WorkItem = namedtuple('WorkItem', ['shift_num', 'name', 'priority'])
+
+
+def normalize_name(name):
+    """Collapse whitespace in name, raising ValueError if it is empty."""
+    name = ' '.join(str(name).split())
+    if not name: raise ValueError("Empty name")
+    return name
+
+
+def normalize_shift(shift):
+    """
+    Convert a shift name, or an alias such as 'Sun AM' or 'thurs eve',
+    to its index in SHIFTS, raising ValueError if it isn't a valid shift.
+    """
+    words = str(shift).lower().split()
+    if len(words) == 2:
+        day = DAY_ALIASES.get(words[0], words[0])
+        time = TIME_ALIASES.get(words[1], words[1])
+        shift_num = SHIFT_TO_INT.get(f"{day} {time}")
+        if shift_num is not None: return shift_num
+    raise ValueError(f"{shift!r} is not a valid shift")
+
+
+class Roster:
+    """
+    Validated roster of people and the shifts they want, compiled into
+    a flat list of work items which can be allocated to cells in one pass.
+
+    Everything is validated and normalized at load time, so a bad shift
+    name fails before we start filling, not halfway through.
+
+    Attributes
+    ----------
+    people : list[dict]
+        Normalized people, each with a name, shifts (list of shift indices,
+        in order of preference), priority and max_shifts.
+
+    work_items : list[WorkItem]
+        Flat list of (shift_num, name, priority) work items, highest
+        priority first, then in roster order.
+    """
+    def __init__(self, people):
+        self.people = people
+        self.work_items = self.compile()
+
+    @classmethod
+    def load(cls, shift_list):
+        """
+        Validate and normalize a roster.
+
+        Parameters
+        ----------
+        shift_list : list
+            List of people, each either [name, [shifts]] as in the old
+            shift_list format, [name, [shifts], options] or a dict with
+            'name' and 'shifts' keys. Options are 'priority' (int, higher
+            is filled first, default 0) and 'max_shifts' (int, maximum
+            number of the listed shifts to fill, default all of them).
+            Shifts can use aliases, e.g 'sun am' or 'Thurs Eve'.
+
+        Returns
+        -------
+        roster : Roster
+            The compiled roster.
+
+        Raises
+        ------
+        ValueError
+            Listing every problem with the roster.
+        """
+        people = []
+        errors = []
+        seen_names = set()
+        for i, person in enumerate(shift_list):
+            if isinstance(person, dict):
+                entry = dict(person)
+            elif isinstance(person, (list, tuple)) and len(person) in (2, 3):
+                entry = {'name': person[0], 'shifts': person[1]}
+                if len(person) == 3:
+                    if not isinstance(person[2], dict):
+                        errors.append(f"Entry {i}: options must be a dict, got {person[2]!r}")
+                        continue
+                    entry.update(person[2])
+            else:
+                errors.append(f"Entry {i}: expected [name, [shifts]], got {person!r}")
+                continue
+
+            if not isinstance(entry.get('name'), str):
+                errors.append(f"Entry {i}: name must be a str, got {entry.get('name')!r}")
+                continue
+            try:
+                name = normalize_name(entry['name'])
+            except ValueError as e:
+                errors.append(f"Entry {i}: {e}")
+                continue
+            if name.lower() in seen_names:
+                errors.append(f"{name}: listed more than once")
+            seen_names.add(name.lower())
+
+            shifts = entry.get('shifts', [])
+            if isinstance(shifts, str): shifts = [shifts]
+            if not isinstance(shifts, (list, tuple)):
+                errors.append(f"{name}: shifts must be a list, got {shifts!r}")
+                shifts = []
+            shift_nums = []
+            for shift in shifts:
+                try:
+                    shift_num = normalize_shift(shift)
+                except ValueError as e:
+                    errors.append(f"{name}: {e}")
+                    continue
+                if shift_num not in shift_nums: shift_nums.append(shift_num)
+
+            priority = entry.get('priority', 0)
+            max_shifts = entry.get('max_shifts', len(shift_nums))
+            for option, value in (('priority', priority), ('max_shifts', max_shifts)):
+                if not isinstance(value, int) or isinstance(value, bool):
+                    errors.append(f"{name}: {option} must be an int, got {value!r}")
+            if isinstance(max_shifts, int) and max_shifts < 0:
+                errors.append(f"{name}: max_shifts must not be negative")
+
+            people.append({'name': name, 'shifts': shift_nums,
+                           'priority': priority, 'max_shifts': max_shifts})
+
+        if errors:
+            raise ValueError("Invalid roster:\n" + "\n".join(errors))
+        return cls(people)
+
+    @classmethod
+    def from_json(cls, path):
+        """Load and validate a roster from a json file of people."""
+        with open(path, 'r') as f:
+            return cls.load(json.load(f))
+
+    def without(self, filled_shifts):
+        """
+        Get a new roster with already filled shifts removed, e.g to resume
+        an interrupted fill. Each removed shift counts towards max_shifts.
+
+        Parameters
+        ----------
+        filled_shifts : list[list[str]]
+            List of [name, shift] already filled.
+
+        Returns
+        -------
+        roster : Roster
+            Roster of the remaining shifts.
+        """
+        filled = {(name, normalize_shift(shift)) for name, shift in filled_shifts}
+        people = []
+        for person in self.people:
+            shifts = [shift_num for shift_num in person['shifts']
+                      if (person['name'], shift_num) not in filled]
+            num_filled = len(person['shifts']) - len(shifts)
+            people.append({**person, 'shifts': shifts,
+                           'max_shifts': max(0, person['max_shifts'] - num_filled)})
+        return Roster(people)
+
+    def compile(self):
+        """
+        Flatten the people into work items, highest priority first.
+        Python's sort is stable, so equal priorities keep roster order.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        work_items : list[WorkItem]
+            Flat list of (shift_num, name, priority) work items.
+        """
+        work_items = [WorkItem(shift_num, person['name'], person['priority'])
+                      for person in self.people for shift_num in person['shifts']]
+        work_items.sort(key=lambda item: -item.priority)
+        return work_items
+
+    def allocate(self, occupancy):
+        """
+        Assign work items to concrete cells in a single pass over the
+        occupancy map, keeping a next free cell pointer per shift.
+
+        Parameters
+        ----------
+        occupancy : list[list[bool]]
+            For each shift, whether each of its cells is occupied.
+
+        Returns
+        -------
+        plan : list[tuple[WorkItem, int]]
+            Work items and the index of the cell within the shift to fill.
+
+        failed : list[WorkItem]
+            Work items whose shift has no free cells left.
+        """
+        next_free = [0] * len(occupancy)
+        num_assigned = {person['name']: 0 for person in self.people}
+        max_shifts = {person['name']: person['max_shifts'] for person in self.people}
+        plan = []
+        failed = []
+        for item in self.work_items:
+            if num_assigned[item.name] >= max_shifts[item.name]: continue
+            cells = occupancy[item.shift_num]
+            i = next_free[item.shift_num]
+            while i < len(cells) and cells[i]: i += 1
+            if i < len(cells):
+                plan.append((item, i))
+                num_assigned[item.name] += 1
+                i += 1
+            else:
+                failed.append(item)
+            next_free[item.shift_num] = i
+
+        return plan, failed
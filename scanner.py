@@ -1,14 +1,10 @@
 # from microsoftgraph.client import Client
-from oauthlib.oauth2 import WebApplicationClient
 from urllib.parse import urlparse, parse_qs
 import requests
 import json
 import msal
-import subprocess
+import os
 import webbrowser
-import time
-from datetime import datetime as dt
-import pyautogui as pa
 
 class GraphClient:
     """
@@ -98,6 +94,19 @@ class GraphClient:
         self.refresh_token = token_dict['refresh_token']
         self.token_expires_in = token_dict['expires_in'] # In seconds
 
+    def save_tokens(self, path):
+        """Save the refresh token to path, so a restart can skip logging in."""
+        with open(path, 'w') as f:
+            json.dump({'refresh_token': self.refresh_token}, f)
+        os.chmod(path, 0o600)
+
+    def load_tokens(self, path):
+        """Load a saved refresh token from path. Returns True if one was found."""
+        if not os.path.exists(path): return False
+        with open(path, 'r') as f:
+            self.refresh_token = json.load(f).get('refresh_token')
+        return self.refresh_token is not None
+
     def get_rota(self, relative_file_path):
         """
         Get the json response from requesting the rota at relative_file_path.
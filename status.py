@@ -0,0 +1,210 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime as dt
+
+
+class EventLog:
+    """
+    Buffered, rotating, structured event log.
+    Events are queued and written as json lines by a background thread in
+    batches, so logging never blocks the polling loop on file I/O. The
+    queue is bounded and write errors (e.g a full disk) are counted rather
+    than raised, so a failing log drops events instead of growing forever.
+
+    Attributes
+    ----------
+    path : str
+        Path of the log file. Rotated files are path.1, path.2, ...
+
+    max_bytes : int
+        Size at which the log file is rotated.
+
+    backup_count : int
+        Number of rotated files to keep.
+
+    flush_interval : float
+        Maximum seconds an event waits in the buffer before being written.
+
+    max_queued : int
+        Maximum number of events waiting to be written, any more are dropped.
+
+    dropped : int
+        Number of events dropped, because the queue was full or writing failed.
+
+    write_errors : collections.Counter
+        Number of failed writes, by category (the exception type).
+    """
+    def __init__(self, path='events.jsonl', max_bytes=1_000_000, backup_count=3,
+                 flush_interval=5, max_queued=10_000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.write_errors = Counter()
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.thread = threading.Thread(target=self.writer_loop, daemon=True)
+        self.thread.start()
+
+    def write(self, event):
+        """Queue an event dict to be written, dropping it if the queue is full."""
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def writer_loop(self):
+        """Background thread, writes queued events in batches."""
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while running:
+                try:
+                    event = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if event is None:  # Closing
+                    running = False
+                else:
+                    batch.append(event)
+            if batch: self.flush(batch)
+
+    def flush(self, batch):
+        """
+        Write a batch of events, rotating the file first if it is too big.
+        If writing fails the batch is dropped, so the writer thread keeps going.
+        """
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self.rotate()
+            with open(self.path, 'a') as f:
+                f.write(''.join(json.dumps(event, default=str) + '\n' for event in batch))
+        except OSError as e:
+            self.write_errors[type(e).__name__] += 1
+            self.dropped += len(batch)
+
+    def rotate(self):
+        """Shift path -> path.1 -> path.2 ..., dropping the oldest."""
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i+1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        """Write any buffered events and stop the writer thread."""
+        try:
+            self.queue.put(None, timeout=10)
+        except queue.Full:  # Writer is stuck, it is a daemon so won't hold us up
+            return
+        self.thread.join(timeout=10)
+
+
+class Status:
+    """
+    Compact status dashboard which refreshes in place at a capped rate,
+    with error counters by category and a fixed size ring buffer of
+    recent events. Every event is also written to the event log.
+
+    Attributes
+    ----------
+    fields : dict
+        Status fields to show, e.g {'Check': 12, 'AFK': False}.
+
+    error_counts : collections.Counter
+        Number of errors seen, by category (the exception type).
+
+    events : collections.deque
+        The most recent (time, category, message) events.
+
+    min_interval : float
+        Minimum seconds between renders.
+
+    log : EventLog
+        Structured log every event is written to.
+
+    scrolling : bool
+        If True, e.g while the filler worker is printing to the same
+        terminal, only the summary line is appended instead of redrawing
+        in place, so that the other output isn't wiped.
+    """
+    def __init__(self, min_interval=1, max_events=5, log=None, stream=sys.stdout):
+        self.fields = {}
+        self.error_counts = Counter()
+        self.events = deque(maxlen=max_events)
+        self.min_interval = min_interval
+        self.log = log or EventLog()
+        self.stream = stream
+        self.last_render = 0
+        self.lines_drawn = 0
+        self.scrolling = False
+        self.start_time = dt.now()  # Keep track of time elapsed
+
+    def update(self, **fields):
+        """Update status fields, e.g update(check=12, afk=False)."""
+        self.fields.update(fields)
+
+    def event(self, category, message):
+        """Record an event in the ring buffer and the log."""
+        now = dt.now()
+        self.events.append((now, category, message))
+        self.log.write({'time': now.isoformat(), 'category': category, 'message': message})
+
+    def error(self, e):
+        """Count an exception by its type and record it as an event."""
+        category = type(e).__name__
+        self.error_counts[category] += 1
+        self.event(category, str(e))
+
+    def render(self, force=False):
+        """
+        Redraw the dashboard in place, unless it was drawn less than
+        min_interval seconds ago.
+
+        Parameters
+        ----------
+        force : bool
+            Redraw regardless of min_interval.
+
+        Returns
+        -------
+        None
+        """
+        now = time.monotonic()
+        if not force and now - self.last_render < self.min_interval: return
+        self.last_render = now
+
+        time_elapsed = str(dt.now() - self.start_time).split('.')[0]
+        status = '  '.join(f"{key}: {value}" for key, value in self.fields.items())
+        errors = ', '.join(f"{category} x{count}" for category, count
+                           in self.error_counts.most_common()) or 'none'
+        if self.log.write_errors or self.log.dropped:
+            log_errors = ', '.join(f"{category} x{count}" for category, count
+                                   in self.log.write_errors.most_common())
+            errors += f" (log: {self.log.dropped} events dropped{', ' if log_errors else ''}{log_errors})"
+        lines = [f"Time elapsed: {time_elapsed}  {status}", f"Errors: {errors}"]
+        lines += [f"  {event_time:%H:%M:%S} {category}: {message}"[:120]
+                  for event_time, category, message in self.events]
+
+        if self.stream.isatty() and not self.scrolling:
+            # Move back up over the last dashboard and clear it
+            if self.lines_drawn: self.stream.write(f"\x1b[{self.lines_drawn}F\x1b[J")
+            self.stream.write('\n'.join(lines) + '\n')
+            self.lines_drawn = len(lines)
+        else:  # Not a terminal, or sharing it, so only the summary and errors
+            self.stream.write(f"{lines[0]}  {lines[1]}\n")
+            self.lines_drawn = 0  # Never move back up over other output
+        self.stream.flush()
+
+    def close(self):
+        """Draw the final status and flush the event log."""
+        self.render(force=True)
+        self.log.close()
@@ -0,0 +1,53 @@
+import os
+import sys
+import types
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Always stub out the GUI calls autofiller imports, so the tests never
+# click or type on a real display, and run without one
+pyautogui = types.ModuleType('pyautogui')
+for func in ('click', 'doubleClick', 'moveTo', 'write', 'hotkey', 'press',
+             'keyDown', 'keyUp', 'scroll', 'hscroll'):
+    setattr(pyautogui, func, lambda *args, **kwargs: None)
+pyautogui.position = lambda: (0, 0)
+sys.modules['pyautogui'] = pyautogui
+
+PALETTE = [(146, 208, 80), (248, 203, 173), (68, 114, 196)]
+SCREEN_SIZE = (1080, 1920)
+
+
+def make_rota(top, cell_height=18, cell_width=120, left=200):
+    """
+    Synthetic screenshot of a rota: title bars, then 21 shifts of 3 rows
+    of 4 bordered cells, coloured by shift, starting at y = top.
+    """
+    width, height = SCREEN_SIZE
+    img = np.full((height, width, 3), 255, np.uint8)
+    img[:150] = (33, 115, 70)  # Title bars
+    right = left + 4 * (cell_width + 1)
+    y = top
+    for shift in range(21):
+        for _ in range(3):
+            img[y, left:right+1] = 0
+            for k in range(5):
+                img[y:y+cell_height+1, left + k*(cell_width+1)] = 0
+            for k in range(4):
+                x = left + 1 + k*(cell_width+1)
+                img[y+1:y+cell_height+1, x:x+cell_width] = PALETTE[shift % 3]
+            y += cell_height + 1
+    img[y, left:right+1] = 0
+    return img
+
+
+@pytest.fixture
+def rota():
+    return make_rota
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    import time
+    monkeypatch.setattr(time, 'sleep', lambda secs: None)
@@ -0,0 +1,132 @@
+"""
+Minimal X server, speaking just enough of the core protocol and MIT-SHM for
+Xlib's XOpenDisplay, XSync and XShmAttach/GetImage/Detach, so that the x11
+capture backend can be tested without a real display or Xvfb.
+
+The root window holds a fixed test pattern, pixel (x, y) is
+RGB ((x + y) % 256, y % 256, x % 256), see expected_pixels.
+
+Usage: python fake_x11.py DISPLAY_NUMBER WIDTH HEIGHT
+"""
+import ctypes
+import os
+import socket
+import struct
+import sys
+import threading
+import numpy as np
+
+SHM_OPCODE = 130
+libc = ctypes.CDLL(None, use_errno=True)
+libc.shmat.argtypes, libc.shmat.restype = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int], ctypes.c_void_p
+libc.shmdt.argtypes = [ctypes.c_void_p]
+
+
+def expected_pixels(left, top, width, height):
+    """The RGB test pattern of a region of the screen."""
+    ys, xs = np.mgrid[top:top+height, left:left+width]
+    return np.stack([(xs + ys) % 256, ys % 256, xs % 256], axis=-1).astype(np.uint8)
+
+
+def pad(n):
+    return (4 - n % 4) % 4
+
+
+class Client(threading.Thread):
+    """Serves one client connection."""
+    def __init__(self, conn, screen):
+        super().__init__(daemon=True)
+        self.conn = conn
+        self.screen = screen  # (height, width, 4) BGRX
+        self.seq = 0
+        self.segments = {}  # shmseg -> address
+
+    def recv(self, n):
+        data = b''
+        while len(data) < n:
+            chunk = self.conn.recv(n - len(data))
+            if not chunk: raise EOFError
+            data += chunk
+        return data
+
+    def reply(self, data_byte, body=b''):
+        self.conn.sendall(struct.pack('<BBHI', 1, data_byte, self.seq & 0xffff, 0) + body.ljust(24, b'\0'))
+
+    def setup(self):
+        head = self.recv(12)
+        if head[:1] != b'l': raise EOFError  # Only little endian clients
+        n_name, n_data = struct.unpack('<HH', head[6:10])
+        self.recv(n_name + pad(n_name) + n_data + pad(n_data))  # Any auth is fine
+        height, width = self.screen.shape[:2]
+        vendor = b'fake'
+        formats = struct.pack('<BBBxxxxx', 1, 1, 32) + struct.pack('<BBBxxxxx', 24, 32, 32)
+        visual = struct.pack('<IBBHIIIxxxx', 0x21, 4, 8, 256, 0xff0000, 0xff00, 0xff)  # TrueColor
+        depth = struct.pack('<BxHxxxx', 24, 1) + visual
+        screen = struct.pack('<IIIIIHHHHHHIBBBB', 0x100, 0x20, 0xffffff, 0, 0, width, height,
+                             width // 4, height // 4, 1, 1, 0x21, 0, 0, 24, 1) + depth
+        info = struct.pack('<IIIIHHBBBBBBBBxxxx', 1, 0x200000, 0x1fffff, 0, len(vendor), 0xffff,
+                           1, 2, 0, 0, 32, 32, 8, 255)
+        info += vendor + b'\0' * pad(len(vendor)) + formats + screen
+        self.conn.sendall(struct.pack('<BxHHH', 1, 11, 0, len(info) // 4) + info)
+
+    def run(self):
+        try:
+            self.setup()
+            while True:
+                opcode, data, length = struct.unpack('<BBH', self.recv(4))
+                body = self.recv(length*4 - 4)
+                self.seq += 1
+                self.handle(opcode, data, body)
+        except (EOFError, OSError):
+            pass
+        finally:
+            for addr in self.segments.values(): libc.shmdt(addr)
+            self.conn.close()
+
+    def handle(self, opcode, data, body):
+        if opcode == 98:  # QueryExtension, only MIT-SHM is present
+            n = struct.unpack('<H', body[:2])[0]
+            present = body[4:4+n] == b'MIT-SHM'
+            self.reply(0, struct.pack('<BBBB', present, SHM_OPCODE if present else 0, 0, 0))
+        elif opcode == 20:  # GetProperty, nothing is ever set
+            self.reply(0)
+        elif opcode == 43:  # GetInputFocus, used by XSync
+            self.reply(1, struct.pack('<I', 0x100))
+        elif opcode == SHM_OPCODE:
+            self.handle_shm(data, body)
+        # Anything else (e.g CreateGC, FreeGC) needs no reply
+
+    def handle_shm(self, minor, body):
+        if minor == 0:  # QueryVersion
+            self.reply(0, struct.pack('<HHHHB', 1, 2, os.getuid(), os.getgid(), 2))
+        elif minor == 1:  # Attach
+            shmseg, shmid = struct.unpack('<II', body[:8])
+            self.segments[shmseg] = libc.shmat(shmid, None, 0)
+        elif minor == 2:  # Detach
+            libc.shmdt(self.segments.pop(struct.unpack('<I', body[:4])[0]))
+        elif minor == 4:  # GetImage, always ZPixmap into the segment
+            x, y, width, height = struct.unpack('<hhHH', body[4:12])
+            shmseg, offset = struct.unpack('<II', body[20:28])
+            region = np.ascontiguousarray(self.screen[y:y+height, x:x+width])
+            ctypes.memmove(self.segments[shmseg] + offset, region.ctypes.data, region.nbytes)
+            self.reply(24, struct.pack('<II', 0x21, region.nbytes))
+
+
+def main(display, width, height):
+    rgb = expected_pixels(0, 0, width, height)
+    screen = np.zeros((height, width, 4), dtype=np.uint8)
+    screen[..., 2::-1] = rgb  # BGRX in memory
+    os.makedirs('/tmp/.X11-unix', exist_ok=True)
+    path = f'/tmp/.X11-unix/X{display}'
+    if os.path.exists(path): os.remove(path)
+    server = socket.socket(socket.AF_UNIX)
+    server.bind(path)
+    server.listen(8)
+    print("ready", flush=True)
+    while True:
+        conn, _ = server.accept()
+        Client(conn, screen).start()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
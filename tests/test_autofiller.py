@@ -0,0 +1,76 @@
+import contextlib
+import io
+import pytest
+import autofiller
+from capture import FileCapture
+from conftest import PALETTE, SCREEN_SIZE
+
+
+def draw_name(screen, cell_region, name):
+    """Draw name as dark bars, one per character with a width set by the character."""
+    left, top, width, height = cell_region
+    x = left + 6
+    for char in name:
+        char_width = 3 if char == ' ' else 2 + ord(char) % 4
+        if char != ' ':
+            screen[top+5:top+height-5, x:x+char_width] = 30
+        x += char_width + 1
+
+
+@pytest.fixture
+def filler(rota, no_sleep, monkeypatch):
+    """
+    Autofill on a synthetic rota, which draws written names on the screen.
+    Writes to a cell in races are drawn as the racing colleague's name instead.
+    """
+    capture = FileCapture(rota(251))
+    af = autofiller.Autofill((0, 0, *SCREEN_SIZE), colours=PALETTE + [(0, 0, 0)],
+                             capture_backend=capture, palette_path='')
+    af.races = {}  # y -> colleague's name
+    def move_and_write(coords, text):
+        draw_name(capture.screen, af.get_cell_region(coords), af.races.pop(coords[1], text))
+    monkeypatch.setattr(af, 'move_and_write', move_and_write)
+    monkeypatch.setattr(autofiller.webbrowser, 'open', lambda *args, **kwargs: None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        af.calibrate_start_and_get_shifts()  # So tests know where the cells are
+    return af
+
+
+def fill(af, shift_list):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return af.autofill_shifts('url', shift_list, verify_every=2)
+
+
+def test_text_signature(filler):
+    region = filler.get_cell_region((filler.x0, filler.shifts[0][0][1]))
+    empty = filler.capture_backend.grab(region).copy()
+    assert len(filler.text_signature(empty)[0]) == 0
+    draw_name(filler.capture_backend.screen, region, 'Isaac Lee')
+    profile, clipped = filler.text_signature(filler.capture_backend.grab(region))
+    assert not clipped
+    assert len(profile) == sum(3 if c == ' ' else 2 + ord(c) % 4 for c in 'Isaac Lee') + 8
+
+
+def test_fill_all_confirmed(filler):
+    report = fill(filler, [['Isaac Lee', ['mon am', 'tue am']], ['Nithil Kennedy', ['mon am']]])
+    assert sorted(report['filled']) == [['Isaac Lee', 'monday morning'], ['Isaac Lee', 'tuesday morning'],
+                                        ['Nithil Kennedy', 'monday morning']]
+    assert report['unchecked'] == [['Isaac Lee', 'monday morning']]  # Nothing to compare with yet
+    assert report['contested'] == [] and report['failed'] == [] and report['attempted'] == 3
+
+
+def test_lost_race_is_contested_and_reclaimed(filler):
+    # A colleague wins Isaac's second cell, after his first write gave us his signature
+    filler.races[filler.shifts[3][0][1]] = 'Bo Li'
+    report = fill(filler, [['Isaac Lee', ['mon am', 'tue am']]])
+    assert report['contested'] == [['Isaac Lee', 'tuesday morning']]
+    assert sorted(report['filled']) == [['Isaac Lee', 'monday morning'], ['Isaac Lee', 'tuesday morning']]
+    assert len(report['reclaims']) == 1 and report['attempted'] == 3
+
+
+def test_race_to_a_different_name_checked_by_width(filler):
+    # Nithil's first write is checked against the text width per character of Isaac's
+    filler.races[filler.shifts[3][0][1]] = 'Bo Li'
+    report = fill(filler, [['Isaac Lee', ['mon am']], ['Nithil Kennedy', ['tue am']]])
+    assert report['contested'] == [['Nithil Kennedy', 'tuesday morning']]
+    assert ['Nithil Kennedy', 'tuesday morning'] in report['filled']
@@ -0,0 +1,85 @@
+import ctypes
+import ctypes.util
+import gc
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+from capture import FileCapture, X11ShmCapture
+from fake_x11 import expected_pixels
+
+SCREEN = (1280, 1024)  # xvfb-run's default screen
+
+
+@pytest.fixture
+def x11(monkeypatch):
+    """An X11ShmCapture connected to the fake X server in fake_x11.py."""
+    if not (ctypes.util.find_library('X11') and ctypes.util.find_library('Xext')):
+        pytest.skip("libX11 and libXext are not installed")
+    display = next(n for n in range(90, 100) if not os.path.exists(f'/tmp/.X11-unix/X{n}'))
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(__file__), 'fake_x11.py'),
+         str(display), *map(str, SCREEN)], stdout=subprocess.PIPE, text=True)
+    try:
+        assert server.stdout.readline().strip() == 'ready'
+        monkeypatch.setenv('DISPLAY', f':{display}')
+        capture = X11ShmCapture(max_buffers=2)
+        yield capture
+        capture.close()
+    finally:
+        server.kill()
+        server.wait()
+        if os.path.exists(f'/tmp/.X11-unix/X{display}'): os.remove(f'/tmp/.X11-unix/X{display}')
+
+
+def test_file_capture():
+    screen = expected_pixels(0, 0, 200, 100)
+    capture = FileCapture(screen)
+    assert capture.screen_size == (200, 100)
+    assert np.array_equal(capture.grab((10, 20, 30, 5)), expected_pixels(10, 20, 30, 5))
+
+
+def test_x11_grab(x11):
+    assert x11.screen_size == SCREEN
+    assert np.array_equal(x11.grab((0, 0, *SCREEN)), expected_pixels(0, 0, *SCREEN))
+    assert np.array_equal(x11.grab((10, 20, 5, 3)), expected_pixels(10, 20, 5, 3))
+    with pytest.raises(ValueError):
+        x11.grab((SCREEN[0] - 10, 0, 20, 20))  # X would kill the process
+
+
+def test_x11_evict_and_reuse(x11):
+    screen = x11.grab((0, 0, *SCREEN))  # Held, like Autofill.screen_img
+    held = x11.grab((3, 4, 50, 10))[2:5]  # Held slice of a cell grab
+    for i in range(20):  # More sizes than max_buffers, so buffers are evicted
+        region = (7*i, 11*i, 40 + i % 5, 12)
+        assert np.array_equal(x11.grab(region), expected_pixels(*region))
+    # Buffers with live views are never freed, so these are still readable
+    assert SCREEN in x11.buffers and (50, 10) in x11.buffers
+    assert np.array_equal(screen, expected_pixels(0, 0, *SCREEN))
+    assert np.array_equal(held, expected_pixels(3, 4, 50, 10)[2:5])
+    # Reusing the size of a held buffer overwrites it in place
+    x11.grab((100, 200, 50, 10))
+    assert np.array_equal(held, expected_pixels(100, 200, 50, 10)[2:5])
+
+    del screen, held
+    gc.collect()
+    x11.grab((0, 0, 41, 12))
+    x11.grab((0, 0, 42, 12))
+    assert list(x11.buffers) == [(41, 12), (42, 12)]
+
+
+def test_x11_shmat_failure(x11):
+    libc = x11.libc
+    class FailingLibc:
+        def __getattr__(self, name):
+            return getattr(libc, name)
+        def shmat(self, *args):
+            ctypes.set_errno(22)
+            return ctypes.c_void_p(-1).value  # (void *) -1
+    x11.libc = FailingLibc()
+    with pytest.raises(OSError, match="shmat failed"):
+        x11.grab((0, 0, 10, 10))
+    x11.libc = libc
+    assert (10, 10) not in x11.buffers
+    assert np.array_equal(x11.grab((0, 0, 10, 10)), expected_pixels(0, 0, 10, 10))
@@ -0,0 +1,46 @@
+import numpy as np
+from colours import ColourClassifier
+from conftest import PALETTE
+
+
+def test_lut_classes():
+    classifier = ColourClassifier(PALETTE + [(0, 0, 0)])
+    assert classifier.palette == PALETTE  # Black is the border, not a colour
+    classes = classifier.classify([*PALETTE, (0, 0, 0), (255, 255, 255), (40, 40, 40)])
+    assert list(classes) == [2, 3, 4, ColourClassifier.BORDER,
+                             ColourClassifier.UNKNOWN, ColourClassifier.UNKNOWN]
+    # Shades within the threshold match, anything further doesn't
+    assert classifier.same_class((146, 208, 80), (150, 200, 85))
+    assert classifier.classify([(146, 208, 140)])[0] == ColourClassifier.UNKNOWN
+
+
+def test_classify_image_shape():
+    classifier = ColourClassifier(PALETTE)
+    img = np.zeros((4, 5, 4), dtype=np.uint8)  # RGBA
+    img[1, 2, :3] = PALETTE[1]
+    classes = classifier.classify(img)
+    assert classes.shape == (4, 5)
+    assert classes[1, 2] == 3 and classes[0, 0] == ColourClassifier.BORDER
+
+
+def test_learn(rota, capsys):
+    img = rota(251)[200:]  # Skip the title bars
+    learned = ColourClassifier.learn(img)
+    assert learned.learned
+    assert len(learned.palette) == 3
+    for colour in PALETTE:
+        assert min(np.linalg.norm(np.subtract(colour, col)) for col in learned.palette) < 3
+
+    top_two = ColourClassifier.learn(img, n_colours=2)
+    assert top_two.palette == learned.palette[:2]
+
+
+def test_save_and_load(tmp_path, capsys):
+    path = str(tmp_path / 'palettes.json')
+    assert ColourClassifier.load(path, 'WE.xlsx') is None
+    learned = ColourClassifier(PALETTE, learned=True)
+    learned.save(path, 'WE.xlsx')
+    assert not learned.learned
+    loaded = ColourClassifier.load(path, 'WE.xlsx')
+    assert loaded.palette == PALETTE and not loaded.learned
+    assert ColourClassifier.load(path, 'other.xlsx') is None
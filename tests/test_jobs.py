@@ -0,0 +1,57 @@
+from jobs import JobQueue, get_week
+from roster import Roster
+
+
+def test_get_week():
+    assert get_week('WE190322.xlsx') == '2022-03-19'
+    assert get_week('WE.xlsx') is None
+    assert get_week('WE999999.xlsx') is None
+
+
+def test_newest_week_first(tmp_path):
+    jobs = JobQueue(str(tmp_path / 'jobs.json'))
+    jobs.add('WE120322.xlsx', 'url1')
+    jobs.add('WE190322.xlsx', 'url2')
+    jobs.add('WE050322.xlsx', 'url3')
+    assert [job['rota_name'] for job in jobs.pending()] == \
+        ['WE190322.xlsx', 'WE120322.xlsx', 'WE050322.xlsx']
+    assert jobs.next()['rota_name'] == 'WE190322.xlsx'
+    assert jobs.in_flight == 'WE190322.xlsx'
+    assert jobs.next()['rota_name'] == 'WE120322.xlsx'
+
+
+def test_resume_skips_written(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    jobs = JobQueue(path)
+    jobs.add('WE190322.xlsx', 'url')
+    jobs.next()
+    jobs.written('WE190322.xlsx', ['A', 'monday morning'])
+    jobs.progress('WE190322.xlsx', ['A', 'monday morning'])
+    jobs.written('WE190322.xlsx', ['B', 'monday morning'])  # Crashed before confirming
+
+    resumed = JobQueue(path)  # As if the watcher restarted
+    job = resumed.jobs['WE190322.xlsx']
+    assert job['state'] == JobQueue.QUEUED
+    assert job['filled'] == [['A', 'monday morning']]
+    assert job['written'] == [['B', 'monday morning']]
+    assert resumed.skipped('WE190322.xlsx') == [['A', 'monday morning'], ['B', 'monday morning']]
+
+    roster = Roster.load([['A', ['mon am', 'mon pm']], ['B', ['mon am']]])
+    remaining = roster.without(resumed.skipped('WE190322.xlsx'))
+    assert [(item.name, item.shift_num) for item in remaining.work_items] == [('A', 1)]
+
+
+def test_fail_and_finish(tmp_path):
+    jobs = JobQueue(str(tmp_path / 'jobs.json'), max_attempts=2)
+    jobs.add('WE190322.xlsx', 'url')
+    jobs.next()
+    job = jobs.finish('WE190322.xlsx', {'error': 'RuntimeError: boom'})
+    assert (job['state'], job['attempts'], jobs.in_flight) == (JobQueue.QUEUED, 1, None)
+    jobs.next()
+    assert jobs.fail('WE190322.xlsx', 'again')['state'] == JobQueue.FAILED
+    assert jobs.next() is None
+
+    jobs.add('WE260322.xlsx', 'url')
+    jobs.next()
+    report = {'filled': [], 'failed': [], 'reclaims': [], 'attempted': 0}
+    assert jobs.finish('WE260322.xlsx', report)['state'] == JobQueue.DONE
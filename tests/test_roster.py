@@ -0,0 +1,63 @@
+import pytest
+from roster import Roster, SHIFT_TO_INT, normalize_shift
+
+
+def test_aliases():
+    assert normalize_shift('Sun AM') == SHIFT_TO_INT['sunday morning']
+    assert normalize_shift('thurs eve') == SHIFT_TO_INT['thursday evening']
+    with pytest.raises(ValueError):
+        normalize_shift('funday morning')
+
+
+def test_load_formats():
+    roster = Roster.load([
+        ['A', ['mon am', 'monday morning', 'tue pm']],
+        ['B', ['sun eve'], {'priority': 2, 'max_shifts': 1}],
+        {'name': '  C   D ', 'shifts': 'wed am'},
+        ])
+    assert [person['name'] for person in roster.people] == ['A', 'B', 'C D']
+    assert roster.people[0]['shifts'] == [0, 4]  # Duplicate dropped
+    assert roster.work_items[0].name == 'B'  # Highest priority first
+
+
+@pytest.mark.parametrize('shift_list, error', [
+    ([['A', ['mon am'], 5]], "options must be a dict"),
+    ([['A', None]], "shifts must be a list"),
+    ([{'name': 'A', 'shifts': 3}], "shifts must be a list"),
+    ([[None, ['mon am']]], "name must be a str"),
+    ([{'shifts': ['mon am']}], "name must be a str"),
+    ([['  ', ['mon am']]], "Empty name"),
+    ([['A', ['mon am', 7]]], "7 is not a valid shift"),
+    ([['A', ['mon am']], ['a', ['tue am']]], "listed more than once"),
+    ([['A', ['mon am'], {'priority': 'high'}]], "priority must be an int"),
+    ([['A', ['mon am'], {'max_shifts': -1}]], "max_shifts must not be negative"),
+    (['A'], "expected [name, [shifts]]"),
+    ])
+def test_load_errors(shift_list, error):
+    with pytest.raises(ValueError, match=error.replace('[', r'\[')):
+        Roster.load(shift_list)
+
+
+def test_load_lists_every_error():
+    with pytest.raises(ValueError) as e:
+        Roster.load([['A', ['bad shift']], [None, []], ['B', ['mon am'], 5]])
+    assert len(str(e.value).splitlines()) == 4
+
+
+def test_allocate():
+    roster = Roster.load([['A', ['mon am', 'mon pm']],
+                          ['B', ['mon am'], {'priority': 1}],
+                          ['C', ['mon am', 'mon pm', 'tue am'], {'max_shifts': 1}]])
+    occupancy = [[False, True, False]] + [[False]] * 20
+    occupancy[SHIFT_TO_INT['monday afternoon']] = [True]
+    plan, failed = roster.allocate(occupancy)
+    assert [(item.name, item.shift_num, cell) for item, cell in plan] == \
+        [('B', 0, 0), ('A', 0, 2), ('C', 3, 0)]
+    assert [(item.name, item.shift_num) for item in failed] == [('A', 1), ('C', 0), ('C', 1)]
+
+
+def test_without():
+    roster = Roster.load([['A', ['mon am', 'mon pm'], {'max_shifts': 2}], ['B', ['mon am']]])
+    remaining = roster.without([['A', 'monday morning'], ['B', 'mon am']])
+    assert [(item.name, item.shift_num) for item in remaining.work_items] == [('A', 1)]
+    assert remaining.people[0]['max_shifts'] == 1
@@ -0,0 +1,66 @@
+import io
+import json
+from status import EventLog, Status
+
+
+def test_event_log_writes_and_rotates(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    log = EventLog(path, max_bytes=100, backup_count=2, flush_interval=0.01)
+    for i in range(3):
+        log.write({'message': 'x' * 100, 'i': i})
+        log.close()  # Flush each event as its own batch
+        log = EventLog(path, max_bytes=100, backup_count=2, flush_interval=0.01)
+    log.close()
+    assert [json.loads(line)['i'] for line in open(path)] == [2]
+    assert [json.loads(line)['i'] for line in open(path + '.1')] == [1]
+    assert [json.loads(line)['i'] for line in open(path + '.2')] == [0]
+
+
+def test_event_log_write_errors_are_counted(tmp_path):
+    log = EventLog(str(tmp_path / 'missing' / 'events.jsonl'), flush_interval=0.01)
+    log.write({'message': 'a'})
+    log.write({'message': 'b'})
+    log.close()
+    assert not log.thread.is_alive()  # Stopped by close, not killed by the error
+    assert log.write_errors['FileNotFoundError'] >= 1
+    assert log.dropped == 2
+
+
+def test_event_log_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(EventLog, 'writer_loop', lambda self: None)  # Stuck writer
+    log = EventLog(str(tmp_path / 'events.jsonl'), max_queued=3)
+    for i in range(10):
+        log.write({'i': i})
+    assert log.queue.qsize() == 3 and log.dropped == 7
+
+
+class Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_render(tmp_path):
+    log = EventLog(str(tmp_path / 'events.jsonl'))
+    stream = Terminal()
+    status = Status(min_interval=0, log=log, stream=stream)
+    status.update(check=1)
+    status.error(RuntimeError("boom"))
+    status.render()
+    assert stream.getvalue().count('\n') == 3  # Summary, errors, one event
+    status.scrolling = True  # Sharing the terminal, so append only
+    status.render()
+    assert "\x1b[" not in stream.getvalue()
+    status.close()
+
+
+def test_render_not_a_terminal(tmp_path):
+    log = EventLog(str(tmp_path / 'missing' / 'events.jsonl'))
+    log.write_errors['PermissionError'] += 1
+    log.dropped = 4
+    stream = io.StringIO()
+    status = Status(min_interval=0, log=log, stream=stream)
+    status.error(ValueError("bad"))
+    status.render()
+    line, = stream.getvalue().splitlines()
+    assert "Errors: ValueError x1 (log: 4 events dropped, PermissionError x1)" in line
+    status.close()
@@ -0,0 +1,54 @@
+import contextlib
+import io
+import pytest
+import autofiller
+from capture import FileCapture
+from tracker import RoiTracker
+from conftest import PALETTE, SCREEN_SIZE
+
+
+def calibrated(capture):
+    """Calibrate an Autofill on the capture's screen and track it."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        af = autofiller.Autofill((0, 0, *SCREEN_SIZE), colours=PALETTE + [(0, 0, 0)],
+                                 capture_backend=capture)
+        af.calibrate_start_and_get_shifts()
+        af.tracker = RoiTracker(af)
+    return af
+
+
+@pytest.mark.parametrize('top', [251, 255])
+@pytest.mark.parametrize('scroll', [5, 19, 25, 38, -5, -19, -38])
+def test_measure_drift(rota, no_sleep, top, scroll):
+    capture = FileCapture(rota(top))
+    af = calibrated(capture)
+    assert af.tracker.table_top == top
+    capture.set_screen(rota(top - scroll))
+    assert af.tracker.measure_drift() == (0, -scroll)
+
+
+def test_no_drift(rota, no_sleep):
+    capture = FileCapture(rota(251))
+    af = calibrated(capture)
+    assert af.tracker.measure_drift() == (0, 0)
+
+
+def test_drift_outside_region_is_lost(rota, no_sleep):
+    capture = FileCapture(rota(251))
+    af = calibrated(capture)
+    capture.set_screen(rota(251 - 45))
+    assert af.tracker.measure_drift() is None
+
+
+def test_check_drift_shifts_coords(rota, no_sleep):
+    capture = FileCapture(rota(251))
+    af = calibrated(capture)
+    y0, shifts = af.y0, [[tuple(cell) for cell in shift] for shift in af.shifts]
+    capture.set_screen(rota(251 + 19))
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert af.tracker.check_drift() == (0, 19)
+    assert af.y0 == y0 + 19
+    assert af.shifts[3][1][1] == shifts[3][1][1] + 19
+    assert af.tracker.table_top == 251 + 19
+    # Re-anchored, so the new position is the new zero
+    assert af.tracker.measure_drift() == (0, 0)
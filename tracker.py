@@ -0,0 +1,255 @@
+import numpy as np
+from colours import ColourClassifier
+
+
+class RoiTracker:
+    """
+    Tracks the calibrated rota table of an Autofill object, so that only
+    the region of interest (the calibrated column) needs to be captured.
+    Scroll drift is detected by matching an anchor patch, taken around the
+    top edge of the table (which only occurs once), and the cached
+    coordinates are shifted by the measured offset instead of recalibrating.
+
+    Attributes
+    ----------
+    autofill : autofiller.Autofill
+        Calibrated Autofill object whose coordinates are tracked.
+
+    margin : int
+        Maximum drift, in pixels in each direction, that can be measured.
+
+    threshold : float
+        Maximum mean absolute RGB difference between the anchor and the
+        best matching patch for the match to be trusted.
+
+    min_gap : float
+        Minimum difference between the best and second best scores,
+        below which the match is ambiguous and not trusted.
+
+    table_top : int
+        Screen y coordinate of the top border of the table.
+
+    region : tuple[int]
+        Screen region of interest, i.e (left, top, width, height).
+
+    anchor_box : tuple[int]
+        Anchor patch box relative to region, i.e (left, top, width, height).
+
+    anchor : np.ndarray
+        RGB pixels of the anchor patch at calibration time.
+    """
+    def __init__(self, autofill, margin=40, threshold=12, min_gap=4):
+        self.autofill = autofill
+        self.margin = margin
+        self.threshold = threshold
+        self.min_gap = min_gap
+        self.table_top = self.find_table_top()
+        self.region = self.get_region()
+        self.anchor_box = self.get_anchor_box()
+        left, top, width, height = self.anchor_box
+        frame = self.capture()
+        self.anchor = frame[top:top+height, left:left+width].astype(np.int16)
+
+    def find_table_top(self):
+        """
+        Find the top border of the table by scanning up the calibrated
+        column of the calibration screenshot from y0, through the cells and
+        borders, until we leave the table. The right hand edge of the cell
+        is used, as names are left aligned.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        table_top : int
+            Screen y coordinate of the topmost border of the table.
+        """
+        af = self.autofill
+        x = af.x0 + int(af.cell_width/2) - 2
+        column = np.asarray(af.screen_img)[:af.y0+1, x]
+        classes = af.classifier.classify(column)
+        table_top = None
+        for y in range(af.y0, -1, -1):
+            if classes[y] == ColourClassifier.BORDER:
+                table_top = y
+            elif classes[y] == ColourClassifier.UNKNOWN:
+                break # Left the table
+        if table_top is None: # Fall back to the first cell we found
+            table_top = af.shifts[0][0][1] - af.cell_height
+        return table_top
+
+    def get_anchor_size(self):
+        """
+        Get the half width and the height above/below the table top of
+        the anchor. It is slightly wider than a cell, so it contains both
+        vertical borders, and taller than a row on both sides of the
+        table top, so it can't be matched one row out.
+        """
+        af = self.autofill
+        return int(af.cell_width/2) + 4, af.cell_height + 4
+
+    def get_region(self):
+        """
+        Get the screen region containing the calibrated column,
+        from the anchor above the table top to the last cell of
+        the last shift, padded by margin and clipped to the screen region.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        region : tuple[int]
+            (left, top, width, height) of the region of interest.
+        """
+        af = self.autofill
+        screen_left, screen_top, screen_width, screen_height = af.screen_region
+        half_width, half_height = self.get_anchor_size()
+        last_cell_y = af.shifts[-1][-1][1]
+        left = max(screen_left, af.x0 - half_width - self.margin)
+        top = max(screen_top, self.table_top - half_height - self.margin)
+        right = min(screen_left + screen_width, af.x0 + half_width + self.margin)
+        bottom = min(screen_top + screen_height, last_cell_y + af.cell_height + self.margin)
+        return (left, top, right - left, bottom - top)
+
+    def get_anchor_box(self):
+        """
+        Get the box of the anchor patch relative to region.
+        The patch straddles the top edge of the table, see get_anchor_size.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        anchor_box : tuple[int]
+            (left, top, width, height) of the anchor, relative to region.
+        """
+        af = self.autofill
+        half_width, half_height = self.get_anchor_size()
+        left = max(0, af.x0 - half_width - self.region[0])
+        top = max(0, self.table_top - half_height - self.region[1])
+        return (left, top, 2*half_width, 2*half_height)
+
+    def capture(self):
+        """
+        Screenshot only the region of interest, using the capture
+        backend of autofill.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        frame : np.ndarray
+            (height, width, 3) RGB array of the region.
+        """
+        return self.autofill.capture_backend.grab(self.region)
+
+    def crop(self, frame, box):
+        """
+        Crop a screen box out of a capture of the region.
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            Capture of the region.
+
+        box : tuple[int]
+            (left, top, width, height) in screen coordinates.
+
+        Returns
+        -------
+        crop : np.ndarray
+            (height, width, 3) RGB array, clipped to the region.
+        """
+        left, top, width, height = box
+        left -= self.region[0]
+        top -= self.region[1]
+        return frame[max(0, top):top+height, max(0, left):left+width]
+
+    def measure_drift(self, frame=None):
+        """
+        Find the offset of the anchor patch in frame, by minimising the
+        mean absolute difference over all offsets within margin.
+        The match is only trusted if it is close enough to the anchor and
+        clearly better than any offset more than half a cell away.
+
+        Parameters
+        ----------
+        frame : np.ndarray
+            Capture of the region. If None, a new capture is taken.
+
+        Returns
+        -------
+        offset : tuple[int] or None
+            (dx, dy) drift in pixels, or None if the anchor could not be
+            matched or the match is ambiguous, e.g after a zoom, a scroll
+            of more than margin or if the rota is no longer on screen.
+        """
+        if frame is None: frame = self.capture()
+        frame = np.asarray(frame).astype(np.int16)
+        left, top = self.anchor_box[:2]
+        height, width = self.anchor.shape[:2]
+        frame_height, frame_width = frame.shape[:2]
+
+        # Fast path, nothing has moved
+        patch = frame[top:top+height, left:left+width]
+        if patch.shape == self.anchor.shape and np.abs(patch - self.anchor).mean() < 1:
+            return (0, 0)
+
+        min_dx = max(-self.margin, -left)
+        max_dx = min(self.margin, frame_width - left - width)
+        min_dy = max(-self.margin, -top)
+        max_dy = min(self.margin, frame_height - top - height)
+        if min_dx > max_dx or min_dy > max_dy: return None
+
+        # (3, height, width) to line up with the sliding windows below
+        anchor = self.anchor.transpose(2, 0, 1)
+        scores = np.empty((max_dy - min_dy + 1, max_dx - min_dx + 1))
+        for i, dy in enumerate(range(min_dy, max_dy+1)):
+            rows = frame[top+dy:top+dy+height, left+min_dx:left+max_dx+width]
+            # (n_dx, 3, height, width) view of every horizontal offset
+            windows = np.lib.stride_tricks.sliding_window_view(rows, (height, width), axis=(0, 1))[0]
+            scores[i] = np.abs(windows - anchor).mean(axis=(1, 2, 3))
+
+        i, j = np.unravel_index(np.argmin(scores), scores.shape)
+        best_score = scores[i, j]
+        if best_score > self.threshold: return None
+        # Second best, ignoring the offsets within half a cell of the best,
+        # so this catches a repeat of the pattern, e.g a row or column out
+        ry, rx = int(self.autofill.cell_height/2), int(self.autofill.cell_width/2)
+        others = scores.copy()
+        others[max(0, i-ry):i+ry+1, max(0, j-rx):j+rx+1] = np.inf
+        if others.size and others.min() - best_score < self.min_gap: return None
+        return (min_dx + int(j), min_dy + int(i))
+
+    def check_drift(self):
+        """
+        Measure the drift and, if the table has moved, shift the cached
+        coordinates of autofill and the region of interest to follow it.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        offset : tuple[int] or None
+            (dx, dy) drift applied, or None if the table was lost
+            and a full recalibration is needed.
+        """
+        offset = self.measure_drift()
+        if offset is None or offset == (0, 0): return offset
+        dx, dy = offset
+        print(f"Drift of {offset} detected, shifting cached coordinates...")
+        self.autofill.shift_coords(dx, dy)
+        self.table_top += dy
+        self.region = self.get_region()
+        self.anchor_box = self.get_anchor_box()
+        return offset